@@ -1,25 +1,57 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 import os
-import pandas as pd
-from io import BytesIO
-from utils import compare_buca_jovie
+import tempfile
+from utils import COMPARE_ENGINES, DEFAULT_COMPARE_ENGINE, CorrectionsIndex, compare_incremental, diff_results, engine_inputs, frames_from_rows
+from corrections_store import CorrectionsJournal
+from compare_cache import LRUCache, compare_key
+from snapshot_index import SnapshotIndex
+import snapshot_store
+from parsers import iter_buca_rows, JovieParser
+from batch import run_batch
+from compare_jobs import CompareJobs, JobQueueFull
+from workspaces import InvalidSessionId, Workspaces, check_session_id
+from ingest import read_upload
+from export import iter_csv, write_xlsx
+from state_store import make_state
+from metrics import Metrics
+from timing import PhaseTimer
+from name_registry import KINDS, make_registry
+from response_format import COLUMNAR_MIMETYPE, compress_response, to_columnar, wants_columnar
+from similarity import default_cache as similarity_cache
+import cProfile
+import io
+import pstats
+import time
 import json
+from datetime import datetime, timezone
 
 import os
 CORRECTIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corrections.json')
-
-def save_corrections_to_disk():
-    print("Saving corrections to:", os.path.abspath(CORRECTIONS_FILE))
-    with open(CORRECTIONS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(DATA['corrections'], f, ensure_ascii=False, indent=2)
+CORRECTIONS_JOURNAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corrections.journal.jsonl')
+CORRECTIONS_STORE = CorrectionsJournal(CORRECTIONS_FILE, CORRECTIONS_JOURNAL)
 
 def load_corrections_from_disk():
-    try:
-        with open(CORRECTIONS_FILE, 'r', encoding='utf-8') as f:
-            DATA['corrections'] = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        DATA['corrections'] = []
+    # Snapshot + journal replay; edits append to the journal instead of rewriting the file
+    CORRECTIONS_STORE.load()
+    sync_corrections()
+
+def sync_corrections():
+    """
+    Recompile DATA['corrections'] into the shared index if the corrections changed,
+    here or in another worker. The index carries CORRECTIONS_STORE.version, which is
+    kept in the journal so every worker reports the same one.
+    Call after every change to the corrections list.
+    """
+    index = DATA['corrections_index']
+    if index is not None and index.version == CORRECTIONS_STORE.version \
+            and DATA['corrections_generation'] == CORRECTIONS_STORE.generation:
+        return
+    DATA['corrections_generation'] = CORRECTIONS_STORE.generation
+    DATA['corrections'] = CORRECTIONS_STORE.corrections()
+    DATA['corrections_index'] = CorrectionsIndex(DATA['corrections'], CORRECTIONS_STORE.version)
+    # Cached results were computed with the old corrections
+    COMPARE_CACHE.clear()
 
 app = Flask(__name__)
 CORS(app, supports_credentials=True, resources={r"/*": {"origins": "*"}})
@@ -27,17 +59,127 @@ CORS(app, supports_credentials=True, resources={r"/*": {"origins": "*"}})
 # --- License validation (simple static for now) ---
 LICENSE_KEY = os.environ.get('CASECON_LICENSE_KEY', 'supercalifragilisticexpialidocious')
 
-# --- In-memory storage (for demo; replace with DB in prod) ---
-DATA = {
-    'buca': None,
-    'jovie': None,
-    'corrections': [],
-    'compare_results': None,
-}
+# --- Shared state: in-memory by default, CASECON_STATE_BACKEND=sqlite shares it across workers ---
+# Corrections are shared through their journal; each worker keeps its own compiled copy.
+DATA = make_state(local_keys=('corrections', 'corrections_index', 'corrections_generation'))
+DATA['corrections'] = []
+DATA['corrections_index'] = None
+DATA['corrections_generation'] = None
+
+# Recent /compare results keyed by row content, corrections version and engine
+COMPARE_CACHE = LRUCache(max_entries=int(os.environ.get('CASECON_COMPARE_CACHE_SIZE', '32')))
+
+# Standardized frames of recent /upload files keyed by content hash
+UPLOAD_CACHE = LRUCache(max_entries=16)
+
+# Per-session uploads, parsed rows, compare results and incremental compare state,
+# within a memory budget; idle sessions expire and the least recently used go first.
+# The default leaves room on a 512 MB instance for what the budget doesn't count:
+# COMPARE_CACHE, UPLOAD_CACHE, compare job results, and the unpickled copies each
+# worker keeps in its SQLiteState read cache (up to the budget again per worker).
+WORKSPACES = Workspaces(
+    DATA,
+    max_bytes=int(os.environ.get('CASECON_WORKSPACE_BUDGET_MB', '64')) * 1024 * 1024,
+    ttl=int(os.environ.get('CASECON_WORKSPACE_TTL', '7200')),
+)
+
+def session_id(data=None):
+    """
+    Workspace of this request: 'session' in the JSON body or query string, or the
+    X-Session-Id header. Clients sending none share the default workspace.
+    """
+    return check_session_id((data or {}).get('session') or request.args.get('session')
+                            or request.headers.get('X-Session-Id'))
+
+# Background compares (/compare/jobs) on a bounded thread pool; status lives in DATA
+COMPARE_JOBS = CompareJobs(
+    DATA,
+    workers=int(os.environ.get('CASECON_JOB_WORKERS', '2')),
+    max_queued=int(os.environ.get('CASECON_JOB_QUEUE', '8')),
+    keep=int(os.environ.get('CASECON_JOB_KEEP', '16')),
+)
+
+# --- Instrumentation: per-process metrics for /metrics ---
+METRICS = Metrics()
+METRICS.counter('casecon_http_requests_total', 'HTTP requests by endpoint, method and status.')
+METRICS.histogram('casecon_http_request_seconds', 'HTTP request duration by endpoint.')
+METRICS.histogram('casecon_compare_phase_seconds', 'Time spent in each /compare phase.')
+METRICS.counter('casecon_compare_rows_total', 'Rows compared (buca, jovie) and result rows produced.')
+
+# X-Profile request header returns a cProfile summary instead of the response body.
+# Off unless CASECON_PROFILING=1, since it slows the request and exposes internals.
+PROFILING_ENABLED = os.environ.get('CASECON_PROFILING') == '1'
+PROFILE_SORTS = ('cumulative', 'tottime', 'ncalls')
+PROFILE_LINES = 40
+
+@app.before_request
+def start_request_timer():
+    request.environ['casecon.start'] = time.perf_counter()
+    if PROFILING_ENABLED and request.headers.get('X-Profile'):
+        profiler = cProfile.Profile()
+        request.environ['casecon.profiler'] = profiler
+        profiler.enable()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    start = request.environ.get('casecon.start')
+    if start is not None:
+        METRICS.observe('casecon_http_request_seconds', time.perf_counter() - start, endpoint=endpoint)
+    METRICS.inc('casecon_http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    profiler = request.environ.get('casecon.profiler')
+    if profiler is None:
+        return response
+    profiler.disable()
+    sort = request.headers.get('X-Profile')
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(sort if sort in PROFILE_SORTS else 'cumulative').print_stats(PROFILE_LINES)
+    # Streamed bodies (ndjson) are produced after this point and aren't covered
+    profiled = Response(out.getvalue(), mimetype='text/plain')
+    profiled.headers['X-Profiled-Status'] = str(response.status_code)
+    return profiled
+
+@app.after_request
+def compress(response):
+    # gzip/deflate (br if installed) per Accept-Encoding for buffered JSON/text bodies
+    return compress_response(response, request.accept_encodings)
+
+def record_compare(timer, engine, buca_rows, jovie_rows, result_rows):
+    for phase, seconds in timer.phases.items():
+        METRICS.observe('casecon_compare_phase_seconds', seconds, engine=engine, phase=phase)
+    METRICS.inc('casecon_compare_rows_total', buca_rows, side='buca')
+    METRICS.inc('casecon_compare_rows_total', jovie_rows, side='jovie')
+    METRICS.inc('casecon_compare_rows_total', result_rows, side='results')
+
+def compare_response(body, timer, engine, buca, jovie, result_rows, columnar=False):
+    """
+    JSON response for /compare with its phase times recorded and sent as Server-Timing.
+    columnar: send the result rows as response_format.to_columnar arrays.
+    """
+    if columnar:
+        if isinstance(body, dict):
+            body = dict(body, results=to_columnar(body['results']))
+        else:
+            body = to_columnar(body)
+    response = jsonify(body)
+    if columnar:
+        response.mimetype = COLUMNAR_MIMETYPE
+    timer.mark('jsonify')
+    record_compare(timer, engine, len(buca), len(jovie), result_rows)
+    response.headers['Server-Timing'] = ', '.join(
+        f'{phase};dur={seconds * 1000:.1f}' for phase, seconds in timer.phases.items())
+    return response
 
 # Load corrections from disk at startup
 load_corrections_from_disk()
 
+@app.before_request
+def pick_up_corrections():
+    # Another worker may have edited corrections since this one last looked
+    CORRECTIONS_STORE.refresh()
+    sync_corrections()
+
 @app.route('/')
 def index():
     return {'status': 'CaseCon backend running'}
@@ -54,116 +196,307 @@ def upload():
     # Accept either files or plain text JSON for buca/jovie
     if request.content_type and 'application/json' in request.content_type:
         data = request.get_json()
+        sid = session_id(data)
         buca_text = data.get('buca_text')
         jovie_text = data.get('jovie_text')
         # Parse lines to DataFrames (simple: one per line, columns: Name)
+        import pandas as pd
         if buca_text:
             buca_lines = [l.strip() for l in buca_text.split('\n') if l.strip()]
-            DATA['buca'] = pd.DataFrame({'Name': buca_lines})
+            WORKSPACES.put(sid, 'buca', pd.DataFrame({'Name': buca_lines}))
         if jovie_text:
             jovie_lines = [l.strip() for l in jovie_text.split('\n') if l.strip()]
-            DATA['jovie'] = pd.DataFrame({'Name': jovie_lines})
-        if DATA['buca'] is None and DATA['jovie'] is None:
+            WORKSPACES.put(sid, 'jovie', pd.DataFrame({'Name': jovie_lines}))
+        if WORKSPACES.get(sid, 'buca') is None and WORKSPACES.get(sid, 'jovie') is None:
             return jsonify({'error': 'No data provided.'}), 400
         return jsonify({'success': True})
     else:
-        # Fallback: Excel upload
+        # Fallback: Excel/CSV upload, parsed once per distinct file
         buca_file = request.files.get('buca')
         jovie_file = request.files.get('jovie')
         if not buca_file or not jovie_file:
             return jsonify({'error': 'Both BUCA and JOVIE files required.'}), 400
         try:
-            buca_df = pd.read_excel(buca_file)
-            jovie_df = pd.read_excel(jovie_file)
-            # Try to standardize columns for BUCA
-            buca_cols = [c.lower() for c in buca_df.columns]
-            if 'client' in buca_cols and 'caregivers' in buca_cols:
-                buca_df.columns = [c.capitalize() for c in buca_cols]
-            elif 'name' in buca_cols and 'caregiver' in buca_cols:
-                buca_df = buca_df.rename(columns={'name': 'Client', 'caregiver': 'Caregiver'})
-            elif 'client' in buca_cols and 'caregivers' in buca_cols:
-                buca_df = buca_df.rename(columns={'client': 'Client', 'caregivers': 'Caregiver'})
-            else:
-                return jsonify({'error': 'BUCA file must have columns: Client and Caregiver'}), 400
-            # Try to standardize columns for JOVIE
-            jovie_cols = [c.lower() for c in jovie_df.columns]
-            if 'client' in jovie_cols and 'caregiver' in jovie_cols:
-                jovie_df.columns = [c.capitalize() for c in jovie_cols]
-            elif 'name' in jovie_cols and 'caregiver' in jovie_cols:
-                jovie_df = jovie_df.rename(columns={'name': 'Client', 'caregiver': 'Caregiver'})
-            elif 'client' in jovie_cols and 'caregivers' in jovie_cols:
-                jovie_df = jovie_df.rename(columns={'client': 'Client', 'caregivers': 'Caregiver'})
-            else:
-                return jsonify({'error': 'JOVIE file must have columns: Client and Caregiver'}), 400
-            DATA['buca'] = buca_df
-            DATA['jovie'] = jovie_df
-            return jsonify({'success': True})
+            buca_df = read_upload(buca_file, 'BUCA', UPLOAD_CACHE)
+            jovie_df = read_upload(jovie_file, 'JOVIE', UPLOAD_CACHE)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
+        sid = session_id()
+        WORKSPACES.put(sid, 'buca', buca_df)
+        WORKSPACES.put(sid, 'jovie', jovie_df)
+        return jsonify({'success': True})
+
+def run_compare(engine, buca, jovie, timer=None):
+    """
+    Runs the selected compare engine, reusing the cached result for identical input.
+    timer: optional PhaseTimer, passed on to the engine on a cache miss.
+    """
+    corrections = DATA['corrections_index']
+    key = compare_key(buca, jovie, corrections.version, engine)
+    results = COMPARE_CACHE.get(key)
+    if timer is not None:
+        timer.mark('cache_lookup')
+    if results is None:
+        results = COMPARE_ENGINES[engine](buca, jovie, corrections, timer=timer)
+        COMPARE_CACHE.put(key, results)
+        # Persist name-pair scores so the next run (or restart) reuses them
+        similarity_cache().flush()
+    return results
+
+def run_incremental_compare(sid, buca_df, jovie_df):
+    """
+    Re-compares against the session's previous state, reclassifying only touched clients.
+    Returns the full results plus the delta from the session's previous results.
+    """
+    previous = WORKSPACES.get(sid, 'compare_state')
+    state, stats = compare_incremental(buca_df, jovie_df, DATA['corrections_index'], previous)
+    similarity_cache().flush()
+    WORKSPACES.put(sid, 'compare_state', state)
+    results = state.results()
+    return {
+        'results': results,
+        'delta': diff_results(previous.results() if previous else [], results),
+        'stats': stats,
+    }
 
 @app.route('/compare', methods=['POST'])
 def compare():
+    timer = PhaseTimer()
+    # Engine is picked per request ('loop' or 'merge') so they can be A/B tested
+    data = request.get_json() if request.is_json else None
+    timer.mark('decode')
+    # Opt-in parallel-array result format for large rosters
+    columnar = wants_columnar(data, request.args, request.accept_mimetypes)
+    engine = (data or {}).get('engine') or request.args.get('engine') or DEFAULT_COMPARE_ENGINE
+    if engine not in COMPARE_ENGINES:
+        return jsonify({'error': f"Unknown compare engine '{engine}'", 'engines': sorted(COMPARE_ENGINES)}), 400
     # Accept direct JSON rows (legacy/text workflow)
     if request.is_json:
-        data = request.get_json()
         bucaRows = data.get('bucaRows')
         jovieRows = data.get('jovieRows')
-        corrections = DATA['corrections']
-        import pandas as pd
         if not bucaRows or not jovieRows:
             return jsonify({'error': 'Both BUCA and JOVIE data required'}), 400
-        # Ensure DataFrame type
-        if isinstance(bucaRows, list):
-            buca_df = pd.DataFrame(bucaRows)
-        else:
-            buca_df = bucaRows
-        if isinstance(jovieRows, list):
-            jovie_df = pd.DataFrame(jovieRows)
-        else:
-            jovie_df = jovieRows
-        # Standardize columns for compare_buca_jovie
-        if 'client' in buca_df.columns and 'caregivers' in buca_df.columns:
-            buca_df = buca_df.rename(columns={'client': 'Client', 'caregivers': 'Caregiver'})
-        elif 'client' in buca_df.columns and 'caregiver' in buca_df.columns:
-            buca_df = buca_df.rename(columns={'client': 'Client', 'caregiver': 'Caregiver'})
-        else:
-            return jsonify({'error': 'BUCA data must have client and caregiver(s) columns'}), 400
-        if 'client' in jovie_df.columns and 'caregiver' in jovie_df.columns:
-            jovie_df = jovie_df.rename(columns={'client': 'Client', 'caregiver': 'Caregiver'})
-        else:
-            return jsonify({'error': 'JOVIE data must have client and caregiver columns'}), 400
-        # Flatten any list values in 'Caregiver' columns to comma-separated strings
-        def flatten_caregivers(df):
-            if 'Caregiver' in df.columns:
-                df['Caregiver'] = df['Caregiver'].apply(
-                    lambda x: ', '.join(x) if isinstance(x, list) else (x if x is not None else '')
-                )
-            return df
-        buca_df = flatten_caregivers(buca_df)
-        jovie_df = flatten_caregivers(jovie_df)
-        results = compare_buca_jovie(buca_df, jovie_df, corrections)
-        DATA['compare_results'] = results
-        return jsonify(results)
-    # Fallback: Use cached DATA
-    buca_df = DATA['buca']
-    jovie_df = DATA['jovie']
-    corrections = DATA['corrections']
+        incremental = data.get('incremental')
+        sid = session_id(data)
+        try:
+            # RowRecords for the lite engine; DataFrames for the others and incremental mode
+            if incremental:
+                buca, jovie = frames_from_rows(bucaRows, jovieRows)
+            else:
+                buca, jovie = engine_inputs(engine, bucaRows, jovieRows)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        timer.mark('frames')
+        if incremental:
+            body = run_incremental_compare(sid, buca, jovie)
+            timer.mark('incremental')
+            WORKSPACES.put(sid, 'compare_results', body['results'])
+            timer.mark('store')
+            return compare_response(body, timer, 'incremental', buca, jovie, len(body['results']), columnar)
+        results = run_compare(engine, buca, jovie, timer)
+        WORKSPACES.put(sid, 'compare_results', results)
+        timer.mark('store')
+        return compare_response(results, timer, engine, buca, jovie, len(results), columnar)
+    # Fallback: Use the session's uploaded data
+    sid = session_id()
+    buca_df = WORKSPACES.get(sid, 'buca')
+    jovie_df = WORKSPACES.get(sid, 'jovie')
     if buca_df is None or jovie_df is None:
         return jsonify({'error': 'No data uploaded'}), 400
-    results = compare_buca_jovie(buca_df, jovie_df, corrections)
-    DATA['compare_results'] = results
+    timer.mark('frames')
+    results = run_compare(engine, buca_df, jovie_df, timer)
+    WORKSPACES.put(sid, 'compare_results', results)
+    timer.mark('store')
+    return compare_response(results, timer, engine, buca_df, jovie_df, len(results), columnar)
+
+@app.route('/compare/batch', methods=['POST'])
+def compare_batch():
+    # Many independent BUCA/JOVIE pairs (e.g. one per day or branch) compared in parallel
+    data = request.get_json() or {}
+    pairs = data.get('pairs')
+    if not isinstance(pairs, list) or not pairs or not all(isinstance(p, dict) for p in pairs):
+        return jsonify({'error': 'pairs must be a non-empty list of {id, bucaRows, jovieRows}'}), 400
+    engine = data.get('engine') or request.args.get('engine') or DEFAULT_COMPARE_ENGINE
+    if engine not in COMPARE_ENGINES:
+        return jsonify({'error': f"Unknown compare engine '{engine}'", 'engines': sorted(COMPARE_ENGINES)}), 400
+    results, summary = run_batch(pairs, DATA['corrections_index'], engine)
+    return jsonify({'results': results, 'summary': summary})
+
+@app.route('/compare/jobs', methods=['POST'])
+def submit_compare_job():
+    # Same input as /compare, run in the background: poll /compare/jobs/<id>, then fetch .../result
+    data = request.get_json(silent=True) or {}
+    engine = data.get('engine') or request.args.get('engine') or DEFAULT_COMPARE_ENGINE
+    if engine not in COMPARE_ENGINES:
+        return jsonify({'error': f"Unknown compare engine '{engine}'", 'engines': sorted(COMPARE_ENGINES)}), 400
+    if data.get('incremental'):
+        return jsonify({'error': 'Incremental compares are not run as jobs, use /compare'}), 400
+    sid = session_id(data)
+    bucaRows = data.get('bucaRows')
+    jovieRows = data.get('jovieRows')
+    if bucaRows or jovieRows:
+        if not bucaRows or not jovieRows:
+            return jsonify({'error': 'Both BUCA and JOVIE data required'}), 400
+    elif WORKSPACES.get(sid, 'buca') is None or WORKSPACES.get(sid, 'jovie') is None:
+        return jsonify({'error': 'No data uploaded'}), 400
+    # Optional snapshot of the finished results: {'snapshot': '<name>'}
+    snapshot_name = data.get('snapshot')
+    snap_id = str(uuid.uuid4()) if snapshot_name else None
+
+    def job(timer):
+        if bucaRows:
+            buca, jovie = engine_inputs(engine, bucaRows, jovieRows)
+        else:
+            buca, jovie = WORKSPACES.get(sid, 'buca'), WORKSPACES.get(sid, 'jovie')
+            if buca is None or jovie is None:
+                raise ValueError('No data uploaded')
+        timer.mark('frames')
+        results = run_compare(engine, buca, jovie, timer)
+        record_compare(timer, engine, len(buca), len(jovie), len(results))
+        WORKSPACES.put(sid, 'compare_results', results)
+        if snap_id:
+            _store_snapshot({'id': snap_id, 'name': str(snapshot_name), 'createdAt': datetime.now(timezone.utc).isoformat(),
+                             'stores': {'compare': {'results': results}}})
+        return results
+
+    info = {'engine': engine, 'session': sid, 'snapshotId': snap_id}
+    if bucaRows:
+        info['rows'] = {'buca': len(bucaRows), 'jovie': len(jovieRows)}
+    try:
+        status = COMPARE_JOBS.submit(job, **info)
+    except JobQueueFull as e:
+        response = jsonify({'error': 'queue_full', 'message': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    response = jsonify(status)
+    response.headers['Location'] = f"/compare/jobs/{status['id']}"
+    return response, 202
+
+@app.get('/compare/jobs/<job_id>')
+def compare_job_status(job_id):
+    status = COMPARE_JOBS.status(job_id)
+    if status is None:
+        return jsonify({'error': 'not_found'}), 404
+    return jsonify(status)
+
+@app.get('/compare/jobs/<job_id>/result')
+def compare_job_result(job_id):
+    status = COMPARE_JOBS.status(job_id)
+    if status is None:
+        return jsonify({'error': 'not_found'}), 404
+    if status['state'] != 'done':
+        return jsonify({'error': 'not_ready', 'job': status}), 409
+    results = COMPARE_JOBS.result(job_id) or []
+    if wants_columnar(None, request.args, request.accept_mimetypes):
+        response = jsonify(to_columnar(results))
+        response.mimetype = COLUMNAR_MIMETYPE
+        return response
     return jsonify(results)
 
+@app.post('/compare/jobs/<job_id>/cancel')
+def cancel_compare_job(job_id):
+    status = COMPARE_JOBS.cancel(job_id)
+    if status is None:
+        return jsonify({'error': 'not_found'}), 404
+    return jsonify(status)
+
+@app.errorhandler(InvalidSessionId)
+def invalid_session(e):
+    return jsonify({'error': 'invalid_session', 'message': str(e)}), 400
+
+@app.errorhandler(snapshot_store.InvalidSnapshotId)
+def invalid_snapshot_id(e):
+    return jsonify({'error': 'invalid_snapshot_id', 'message': str(e)}), 400
+
+@app.get('/workspaces')
+def list_workspaces():
+    # Totals and budget for all workspaces, but only the caller's own session in
+    # detail: session ids are the only key to a workspace, so they are never listed
+    stats = WORKSPACES.stats()
+    sid = session_id()
+    return jsonify({
+        'sessionCount': len(stats['sessions']),
+        'totalBytes': stats['totalBytes'],
+        'maxBytes': stats['maxBytes'],
+        'ttlSeconds': stats['ttlSeconds'],
+        'evictions': stats['evictions'],
+        'session': next((s for s in stats['sessions'] if s['session'] == sid), None),
+    })
+
+@app.delete('/workspaces/<sid>')
+def drop_workspace(sid):
+    # Operators can free their workspace when done instead of waiting for the TTL
+    if check_session_id(sid) != session_id():
+        return jsonify({'error': 'forbidden', 'message': 'Only your own session workspace can be dropped'}), 403
+    if not WORKSPACES.drop(sid):
+        return jsonify({'error': 'not_found'}), 404
+    return jsonify({'ok': True})
+
+@app.get('/compare/cache')
+def compare_cache_stats():
+    return jsonify(COMPARE_CACHE.stats())
+
+@app.get('/metrics')
+def metrics():
+    # Prometheus text format; cache and session figures are read at scrape time
+    caches = {'compare': COMPARE_CACHE.stats(), 'upload': UPLOAD_CACHE.stats()}
+    similarity = similarity_cache().stats()
+    jobs = COMPARE_JOBS.stats()
+    workspaces = WORKSPACES.stats()
+    def per_cache(field):
+        return [({'cache': name}, stats[field]) for name, stats in caches.items()]
+    collected = [
+        ('casecon_cache_entries', 'gauge', 'Entries held per cache.', per_cache('entries')),
+        ('casecon_cache_hits_total', 'counter', 'Cache hits per cache.', per_cache('hits')),
+        ('casecon_cache_misses_total', 'counter', 'Cache misses per cache.', per_cache('misses')),
+        ('casecon_cache_evictions_total', 'counter', 'Cache evictions per cache.', per_cache('evictions')),
+        ('casecon_similarity_entries', 'gauge', 'Name-pair similarity scores held in memory.',
+         [({}, similarity['entries'])]),
+        ('casecon_similarity_lookups_total', 'counter', 'Name-pair similarity lookups by outcome.',
+         [({'outcome': o}, similarity[o]) for o in ('hits', 'misses', 'skipped')]),
+        ('casecon_compare_jobs_pending', 'gauge', 'Compare jobs queued or running in this worker.',
+         [({}, jobs['pending'])]),
+        ('casecon_compare_jobs_total', 'counter', 'Compare jobs finished, by final state.',
+         [({'state': state}, n) for state, n in jobs['finished'].items()]),
+        ('casecon_workspaces', 'gauge', 'Session workspaces held.', [({}, len(workspaces['sessions']))]),
+        ('casecon_workspace_bytes', 'gauge', 'Estimated bytes held by all session workspaces.',
+         [({}, workspaces['totalBytes'])]),
+        ('casecon_workspace_evictions_total', 'counter', 'Session workspaces dropped, by reason.',
+         [({'reason': reason}, n) for reason, n in workspaces['evictions'].items()]),
+        ('casecon_corrections', 'gauge', 'Corrections currently loaded.', [({}, len(DATA['corrections']))]),
+    ]
+    return Response(METRICS.render(collected), mimetype='text/plain; version=0.0.4')
+
+
+def invalid_correction(correction):
+    """
+    Why correction can't be stored, or None if it can: buca and jovie must be strings.
+    """
+    if not isinstance(correction, dict):
+        return 'A correction must be an object with type, buca and jovie'
+    for field in ('buca', 'jovie'):
+        if not isinstance(correction.get(field), str):
+            return f"Correction '{field}' must be a string"
+    return None
 
 @app.route('/corrections', methods=['GET', 'POST'])
 def corrections():
     if request.method == 'GET':
-        return jsonify({'corrections': DATA['corrections']})
+        return jsonify({'corrections': DATA['corrections'], 'version': DATA['corrections_index'].version})
     # POST: Update corrections
     data = request.get_json()
     print("Received corrections (corrections endpoint):", data)
-    DATA['corrections'] = data.get('corrections', [])
-    save_corrections_to_disk()
+    new_corrections = data.get('corrections', [])
+    if not isinstance(new_corrections, list):
+        return jsonify({'error': 'corrections must be a list'}), 400
+    for c in new_corrections:
+        error = invalid_correction(c)
+        if error:
+            return jsonify({'error': error, 'correction': c}), 400
+    CORRECTIONS_STORE.replace(new_corrections)
+    sync_corrections()
     return jsonify({'success': True})
 
 @app.route('/add_correction', methods=['POST'])
@@ -174,9 +507,12 @@ def add_correction():
     if not correction:
         return jsonify({'error': 'No correction provided'}), 400
     # Only keep type, buca, jovie fields
+    error = invalid_correction(correction)
+    if error:
+        return jsonify({'error': error}), 400
     filtered = {k: correction[k] for k in ['type', 'buca', 'jovie'] if k in correction}
-    DATA['corrections'].append(filtered)
-    save_corrections_to_disk()
+    CORRECTIONS_STORE.add(filtered)
+    sync_corrections()
     return jsonify({'success': True})
 
 @app.route('/delete_correction', methods=['POST'])
@@ -187,34 +523,41 @@ def delete_correction():
     # Only keep type, buca, jovie fields for matching
     if correction:
         correction = {k: correction[k] for k in ['type', 'buca', 'jovie'] if k in correction}
-    def correction_matches(a, b):
-        if not a or not b:
-            return False
-        if a.get('type') is None or b.get('type') is None:
-            return False
-        if a.get('type') != b.get('type'):
-            return False
-        return a.get('buca') == b.get('buca') and a.get('jovie') == b.get('jovie')
-    before = len(DATA['corrections'])
-    DATA['corrections'] = [
-        c for c in DATA['corrections']
-        if not correction_matches({k: c.get(k) for k in ['type', 'buca', 'jovie']}, correction)
-    ]
-    save_corrections_to_disk()
-    return jsonify({'success': True, 'removed': before - len(DATA['corrections'])})
+    removed = CORRECTIONS_STORE.delete(correction) if correction else 0
+    sync_corrections()
+    return jsonify({'success': True, 'removed': removed})
 
 
 @app.route('/export', methods=['GET'])
 def export():
-    # TODO: Use DATA['compare_results'] to generate Excel
-    # For now, generate dummy Excel file
-    df = pd.DataFrame({'Matched': ['Example1', 'Example2']})
-    output = BytesIO()
-    df.to_excel(output, index=False)
+    # Latest compare results, or a saved snapshot's with ?snapshot=<id>
+    # ?format=xlsx (default) or csv; xlsx also takes ?sheets=tag and ?colors=0
+    snap_id = request.args.get('snapshot')
+    if snap_id:
+        p = _snap_path(snapshot_store.check_snapshot_id(snap_id))
+        if p is None:
+            return jsonify({'error': 'not_found'}), 404
+        snap = snapshot_store.read_snapshot(p)
+        results = ((snap.get('stores') or {}).get('compare') or {}).get('results')
+    else:
+        results = WORKSPACES.get(session_id(), 'compare_results')
+    if not results:
+        return jsonify({'error': 'No compare results to export'}), 400
+    fmt = request.args.get('format', 'xlsx')
+    if fmt == 'csv':
+        return Response(
+            stream_with_context(iter_csv(results)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': 'attachment; filename=CaseConResults.csv'},
+        )
+    if fmt != 'xlsx':
+        return jsonify({'error': f"Unknown export format '{fmt}'"}), 400
+    # Spooled to a temp file and streamed back by send_file
+    output = tempfile.TemporaryFile()
+    write_xlsx(results, output, by_tag=request.args.get('sheets') == 'tag', colors=request.args.get('colors', '1') != '0')
     output.seek(0)
     return send_file(output, download_name='CaseConResults.xlsx', as_attachment=True)
 
-import re
 import uuid
 
 # ---------------------------------------------------------------------------
@@ -223,180 +566,161 @@ import uuid
 SNAP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'snapshots')
 os.makedirs(SNAP_DIR, exist_ok=True)
 
-def _snap_path(snap_id: str) -> str:
-    return os.path.join(SNAP_DIR, f"{snap_id}.json")
+def _snap_path(snap_id: str):
+    # Existing snapshot file (compact .json.gz or legacy .json), None if missing
+    return snapshot_store.snapshot_path(SNAP_DIR, snap_id)
 
-def _list_snapshots():
-    items = []
-    try:
-        for name in os.listdir(SNAP_DIR):
-            if not name.endswith('.json'):
-                continue
-            full = os.path.join(SNAP_DIR, name)
-            try:
-                with open(full, 'r', encoding='utf-8') as f:
-                    snap = json.load(f)
-                stat = os.stat(full)
-                items.append({
-                    'id': snap.get('id') or os.path.splitext(name)[0],
-                    'name': snap.get('name') or os.path.splitext(name)[0],
-                    'createdAt': snap.get('createdAt') or (pd.to_datetime(stat.st_mtime, unit='s').isoformat()),
-                    'createdBy': snap.get('createdBy') or 'unknown',
-                    'appVersion': snap.get('appVersion'),
-                    'schemaVersion': snap.get('schemaVersion'),
-                    'sizeBytes': stat.st_size,
-                })
-            except Exception:
-                # ignore bad file
-                pass
-        items.sort(key=lambda x: str(x.get('createdAt') or ''), reverse=True)
-    except FileNotFoundError:
-        pass
-    return items
+# Listing metadata lives in a sidecar index so listing doesn't parse every snapshot
+SNAP_INDEX = SnapshotIndex(SNAP_DIR, snapshot_store.read_manifest, snapshot_store.is_snapshot_file,
+                           snapshot_store.snapshot_id_from_file)
+
+def _store_snapshot(snap):
+    # Compressed manifest; large row/result blocks are shared across snapshots
+    SNAP_INDEX.upsert(snapshot_store.write_snapshot(SNAP_DIR, snap['id'], snap), snap)
+    # write_snapshot drops any legacy plain .json copy of this id
+    SNAP_INDEX.remove(f"{snap['id']}.json")
 
 @app.get('/api/snapshots')
 def api_list_snapshots():
+    # Optional paging: ?limit=N&cursor=<nextCursor>&sort=createdAt|name|sizeBytes&order=desc|asc
     try:
-        return jsonify({ 'snapshots': _list_snapshots() })
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit < 1:
+            return jsonify({ 'error': 'invalid_limit' }), 400
+        items, next_cursor = SNAP_INDEX.page(
+            sort=request.args.get('sort', 'createdAt'),
+            order=request.args.get('order', 'desc'),
+            limit=limit,
+            cursor=request.args.get('cursor'),
+        )
+        return jsonify({ 'snapshots': items, 'nextCursor': next_cursor })
+    except ValueError as e:
+        return jsonify({ 'error': 'invalid_query', 'message': str(e) }), 400
     except Exception as e:
         return jsonify({ 'error': 'list_failed', 'message': str(e) }), 500
 
 @app.post('/api/snapshots')
 def api_save_snapshot():
+    body = request.get_json(silent=True) or {}
+    incoming = body.get('snapshot') or body
+    if not isinstance(incoming, dict):
+        return jsonify({ 'error': 'invalid_snapshot' }), 400
+    # Checked before anything touches the disk; the id names the snapshot's file
+    snap_id = snapshot_store.check_snapshot_id(incoming.get('id') or uuid.uuid4())
     try:
-        body = request.get_json(silent=True) or {}
-        incoming = body.get('snapshot') or body
-        if not isinstance(incoming, dict):
-            return jsonify({ 'error': 'invalid_snapshot' }), 400
-        snap_id = str(incoming.get('id') or uuid.uuid4())
         name = body.get('name') or incoming.get('name') or snap_id
         final = dict(incoming)
         final['id'] = snap_id
         final['name'] = name
-        with open(_snap_path(snap_id), 'w', encoding='utf-8') as f:
-            json.dump(final, f, ensure_ascii=False, indent=2)
+        _store_snapshot(final)
         return jsonify({ 'ok': True, 'id': snap_id })
     except Exception as e:
         return jsonify({ 'error': 'save_failed', 'message': str(e) }), 500
 
 @app.get('/api/snapshots/<snap_id>')
 def api_get_snapshot(snap_id):
+    snap_id = snapshot_store.check_snapshot_id(snap_id)
     try:
         p = _snap_path(snap_id)
-        if not os.path.exists(p):
+        if p is None:
             return jsonify({ 'error': 'not_found' }), 404
-        with open(p, 'r', encoding='utf-8') as f:
-            snap = json.load(f)
-        return jsonify(snap)
+        return jsonify(snapshot_store.read_snapshot(p))
     except Exception as e:
         return jsonify({ 'error': 'get_failed', 'message': str(e) }), 500
 
 @app.delete('/api/snapshots/<snap_id>')
 def api_delete_snapshot(snap_id):
+    snap_id = snapshot_store.check_snapshot_id(snap_id)
     try:
         p = _snap_path(snap_id)
-        if not os.path.exists(p):
+        if p is None:
             return jsonify({ 'error': 'not_found' }), 404
-        os.remove(p)
+        snapshot_store.delete_snapshot(SNAP_DIR, p)
+        SNAP_INDEX.remove(os.path.basename(p))
         return jsonify({ 'ok': True })
     except Exception as e:
         return jsonify({ 'error': 'delete_failed', 'message': str(e) }), 500
 
+def _text_source(json_field, file_field):
+    """
+    Input for the paste parsers: the JSON field, an uploaded text file, or the raw
+    request body (e.g. text/plain) read as a stream.
+    """
+    if request.is_json:
+        return (request.get_json() or {}).get(json_field, '')
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file') or request.files.get(file_field)
+        return upload.stream if upload else ''
+    return request.stream
+
 @app.route('/process_buca', methods=['POST'])
 def process_buca():
-    data = request.get_json()
-    buca_text = data.get('buca_text', '')
-    buca_lines = [l.strip() for l in buca_text.split('\n') if l.strip()]
-    rows = []
-    # More robust parsing for BUCA lines
-    def parse_buca_line(line):
-        import re
-        # Find the case number: starts with '00' + letter or digit, or 'CAS', then dash, then alphanum/dash
-        # Stop at labels 'Date:' or 'ESTCaregiver:' (with optional whitespace before the label), or any whitespace/end.
-        # This avoids prematurely stopping when 'Date' appears inside another word (e.g., 'Candidate').
-        case_number_pattern = r'((?:00[a-zA-Z0-9]|CAS)[-A-Z0-9]+?)(?=(?:\s*Date:|\s*ESTCaregiver:)|\s|$)'
-        case_number_match = re.search(case_number_pattern, line)
-        if not case_number_match:
-            return {
-                'client': '',
-                'caregivers': [],
-                'caseNumber': '',
-                'is_valid': False,
-                'raw': line
-            }
-        case_number = case_number_match.group(1)
-        client = line[:case_number_match.start()].strip()
-        # Find caregivers
-        cg_match = re.search(r'ESTCaregiver:\s*(.+)$', line)
-        caregivers = []
-        if cg_match:
-            caregivers_raw = cg_match.group(1)
-            caregivers = [cg.strip() for cg in re.split(r'[,/&]| and ', caregivers_raw) if cg.strip()]
-        is_valid = bool(client and case_number and caregivers)
-        return {
-            'client': client,
-            'caregivers': caregivers,
-            'caseNumber': case_number,
-            'is_valid': is_valid,
-            'raw': line
-        }
-    rows = []
-    for idx, line in enumerate(buca_lines):
-        parsed = parse_buca_line(line)
-        parsed['row'] = idx + 1
-        rows.append(parsed)
-
-    DATA['buca'] = rows
+    rows = list(iter_buca_rows(_text_source('buca_text', 'buca')))
+    WORKSPACES.put(session_id(), 'buca', rows)
     return jsonify({'rows': rows})
 
 @app.route('/process_jovie', methods=['POST'])
 def process_jovie():
+    parser = JovieParser()
+    if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+        # One row per line as it is parsed, then a trailer with the date and row count.
+        # Rows aren't kept in the workspace here so memory stays flat for large exports.
+        def generate():
+            count = 0
+            for row in parser.rows(_text_source('jovie_text', 'jovie')):
+                count += 1
+                yield json.dumps(row, ensure_ascii=False) + '\n'
+            yield json.dumps({'done': True, 'date': parser.date, 'count': count}, ensure_ascii=False) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    rows = list(parser.rows(_text_source('jovie_text', 'jovie')))
+    WORKSPACES.put(session_id(), 'jovie', rows)
+    return jsonify({'rows': rows, 'date': parser.date})
+
+# ---------------------------------------------------------------------------
+# Name/UID registry (SQLite-backed) and API
+# ---------------------------------------------------------------------------
+
+# uids.json at the repo root was the registry's storage before; imported once if present
+UIDS_LEGACY_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uids.json')
+NAME_REGISTRY = make_registry(legacy_uids_path=UIDS_LEGACY_FILE)
+
+@app.get('/uids')
+def get_uids():
+    # Curated map edited by the Name/ID Registry panel: {'<kind>:<normalized name>': uid}
+    return jsonify(NAME_REGISTRY.uid_map())
+
+@app.post('/uids')
+def replace_uids():
     data = request.get_json()
-    jovie_text = data.get('jovie_text', '')
-    lines = [line.rstrip() for line in jovie_text.split('\n')]
-    # Extract date if present on first non-empty line (supports 'Mon, Aug, 4th' or 'MM/DD/YYYY')
-    date = None
-    date_pattern1 = r'^(\d{1,2}/\d{1,2}/\d{4})$'  # MM/DD/YYYY
-    date_pattern2 = r'^[A-Za-z]{3},\s+[A-Za-z]{3},\s+\d{1,2}(st|nd|rd|th)?$'  # Mon, Aug, 4th
-    first_idx = next((i for i, l in enumerate(lines) if l.strip()), None)
-    if first_idx is not None:
-        line = lines[first_idx].strip()
-        if re.match(date_pattern1, line) or re.match(date_pattern2, line):
-            date = line
-            lines[first_idx] = ''
-    rows = []
-    rownum = 1
-    i = 0
-    n = len(lines)
-    # Skip date if present
-    while i < n and not lines[i].strip():
-        i += 1
-    if i < n and (re.match(date_pattern1, lines[i].strip()) or re.match(date_pattern2, lines[i].strip())):
-        i += 1
-    # Parse blocks
-    while i < n:
-        # Collect 3 non-empty lines as a block
-        block = []
-        while i < n and len(block) < 3:
-            if lines[i].strip():
-                block.append(lines[i].strip())
-            i += 1
-        if len(block) == 3:
-            rows.append({
-                'row': rownum,
-                'client': block[0],
-                'caregiver': block[1],
-                'time': block[2],
-            })
-            rownum += 1
-        # Skip remaining lines in this block until a blank line or end
-        while i < n and lines[i].strip():
-            i += 1
-        # Skip any blank lines between blocks
-        while i < n and not lines[i].strip():
-            i += 1
-    DATA['jovie'] = rows
-    return jsonify({'rows': rows, 'date': date})
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Body must be a {key: uid} object'}), 400
+    NAME_REGISTRY.replace_uid_map(data)
+    return jsonify({'ok': True, 'count': len(data)})
+
+@app.post('/uids/resolve')
+def resolve_uids():
+    """
+    Bulk resolve. {rows: [...]} returns the rows with clientId/caregiverId(s) and any
+    clientUID/caregiverUID; {names: {client: [...], caregiver: [...]}} returns
+    {client: [ids], caregiver: [ids]} in the same order.
+    """
+    data = request.get_json() or {}
+    names = data.get('names')
+    if names is not None:
+        if not isinstance(names, dict) or any(k not in KINDS or not isinstance(v, list) for k, v in names.items()):
+            return jsonify({'error': f"names must map {' / '.join(KINDS)} to lists of names"}), 400
+        return jsonify({kind: NAME_REGISTRY.intern(kind, values) for kind, values in names.items()})
+    rows = data.get('rows')
+    if not isinstance(rows, list):
+        return jsonify({'error': 'rows must be a list'}), 400
+    return jsonify(NAME_REGISTRY.resolve_rows(rows))
+
+@app.get('/uids/names')
+def list_interned_names():
+    kind = request.args.get('kind')
+    if kind and kind not in KINDS:
+        return jsonify({'error': f"Unknown kind '{kind}'"}), 400
+    return jsonify({'names': NAME_REGISTRY.names(kind)})
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from similarity import default_cache as similarity_cache
+from utils import COMPARE_ENGINES, engine_inputs
+
+# Worker processes for batch compares. Every gunicorn worker gets its own pool, so
+# the default stays small rather than one per core.
+BATCH_WORKERS = int(os.environ.get('CASECON_BATCH_WORKERS', '0')) or min(2, os.cpu_count() or 1)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: forking a threaded server can copy a lock another
+            # thread holds (e.g. the similarity cache's) and deadlock the child
+            _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _run_inline(fn, *args):
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def tag_counts(results):
+    return dict(Counter(r.get('tag') for r in results))
+
+
+def compare_pair(buca_rows, jovie_rows, corrections, engine):
+    """
+    Compare one BUCA/JOVIE pair of /compare-style rows. Runs inside a pool worker.
+    """
+    if not buca_rows or not jovie_rows:
+        raise ValueError('Both BUCA and JOVIE data required')
+    buca, jovie = engine_inputs(engine, buca_rows, jovie_rows)
+    results = COMPARE_ENGINES[engine](buca, jovie, corrections)
+    similarity_cache().flush()
+    return results
+
+
+def run_batch(pairs, corrections, engine):
+    """
+    Compare independent pairs ({id, bucaRows, jovieRows}) in parallel.
+    A failing pair reports its error without failing the others.
+    Returns (per-pair results in input order, aggregate summary).
+    """
+    if len(pairs) == 1:
+        # Not worth shipping a single pair to another process
+        jobs = [_run_inline(compare_pair, pairs[0].get('bucaRows'), pairs[0].get('jovieRows'), corrections, engine)]
+    else:
+        pool = _get_pool()
+        jobs = [pool.submit(compare_pair, p.get('bucaRows'), p.get('jovieRows'), corrections, engine) for p in pairs]
+    out = []
+    totals = Counter()
+    failed = 0
+    for i, (pair, job) in enumerate(zip(pairs, jobs)):
+        pair_id = pair.get('id', i)
+        try:
+            results = job.result()
+        except Exception as e:
+            failed += 1
+            out.append({'id': pair_id, 'error': str(e)})
+            continue
+        counts = tag_counts(results)
+        totals.update(counts)
+        out.append({'id': pair_id, 'results': results, 'summary': {'rows': len(results), 'tags': counts}})
+    summary = {
+        'pairs': len(pairs),
+        'failed': failed,
+        'rows': sum(totals.values()),
+        'tags': dict(totals),
+    }
+    return out, summary
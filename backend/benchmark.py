@@ -0,0 +1,370 @@
+"""
+Benchmarks for the parsing and comparison hot paths on synthetic BUCA/JOVIE data.
+
+    python benchmark.py                              # 100, 1k and 10k rows
+    python benchmark.py --sizes 100000 --engines merge --output bench.json
+    python benchmark.py --baseline bench.json        # exit 1 on regressions
+    python benchmark.py --check                      # exit 1 if the engines disagree
+
+Results are written as JSON (stdout by default): one record per benchmark and size
+with the best and median time over --repeat runs, plus per-phase times for the
+compare engines. The generators are seeded, so two runs see identical input.
+--check runs no timings: it compares every engine's results with the loop engine's
+(and FuzzyIndex with difflib) on the generated rosters and reports differences.
+Name-pair similarity scores are kept in memory only and cleared before each compare
+run, so runs are cold; --warm-similarity keeps them to time the cached case.
+"""
+import argparse
+import difflib
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+from fuzzy_index import FuzzyIndex
+from parsers import JovieParser, iter_buca_rows, parse_buca_line
+from similarity import SimilarityCache, set_default_cache
+from timing import PhaseTimer
+from utils import (COMPARE_ENGINES, apply_corrections, compare_incremental, compile_corrections,
+                   engine_inputs, frames_from_rows)
+
+DEFAULT_SIZES = (100, 1000, 10000)
+# The loop engine scans a frame per client, so it is skipped above this many rows
+# unless --loop-limit is raised
+LOOP_LIMIT = 20000
+
+FIRST_NAMES = (
+    'Adrienne', 'Ana', 'Beatrice', 'Carlos', 'Darnell', 'Denise', 'Elena', 'Fatima',
+    'Gloria', 'Grace', 'Hector', 'Imani', 'Jamal', 'Jescea', 'Joseph', 'Karen', 'Keisha',
+    'Latoya', 'Linda', 'Luis', 'Marisol', 'Mary', 'Nadia', 'Omar', 'Patrice', 'Pedro',
+    'Rita', 'Rosa', 'Shanice', 'Tania', 'Tyrone', 'Yolanda',
+)
+SURNAME_PARTS = (
+    'ad', 'bar', 'bell', 'bran', 'car', 'dal', 'ev', 'fer', 'gar', 'hill', 'jack',
+    'kin', 'lo', 'mil', 'mor', 'nel', 'pez', 'ra', 'ro', 'son', 'ton', 'wa', 'well', 'wright',
+)
+SHIFTS = ('8:00 AM - 12:00 PM', '9:00 AM - 1:00 PM', '12:00 PM - 4:00 PM', '4:00 PM - 8:00 PM')
+CAREGIVER_SEPARATORS = (', ', ' / ', ' & ', ' and ')
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data
+# ---------------------------------------------------------------------------
+
+def _name(rng):
+    surname = ''.join(rng.choice(SURNAME_PARTS) for _ in range(rng.randint(2, 3)))
+    return f"{rng.choice(FIRST_NAMES)} {surname.capitalize()}"
+
+def _unique_names(rng, n, taken=()):
+    seen = set(taken)
+    names = []
+    while len(names) < n:
+        name = _name(rng)
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+def _typo(rng, name):
+    # One dropped, doubled or swapped letter, like a hand-typed roster
+    i = rng.randrange(1, len(name) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return name[:i] + name[i + 1:]
+    if kind == 1:
+        return name[:i] + name[i] + name[i:]
+    return name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]
+
+def _case_number(rng):
+    if rng.random() < 0.8:
+        return f"00{rng.choice('ABCDEFGH0123456789')}-{rng.randrange(10 ** 6, 10 ** 7)}"
+    return f"CAS-{rng.randrange(10 ** 5, 10 ** 6)}"
+
+def generate(rows, seed=0, typo_rate=0.1, mismatch_rate=0.15, missing_rate=0.05,
+             multi_rate=0.2, corrections=50):
+    """
+    Deterministic BUCA paste text, JOVIE paste text and corrections list for about
+    `rows` clients. Of the JOVIE rows, typo_rate have a misspelt client name and
+    mismatch_rate a different caregiver (half misspelt, half another person);
+    missing_rate of the clients appear on only one side. multi_rate of BUCA lines list
+    several caregivers. Corrections map BUCA spellings to the JOVIE ones, topped up
+    with unrelated entries to reach the requested count.
+    """
+    rng = random.Random(seed)
+    clients = _unique_names(rng, rows)
+    caregivers = _unique_names(rng, max(rows // 4, 4), taken={c.lower() for c in clients})
+    buca_lines = []
+    jovie_blocks = []
+    fixes = []
+    for client in clients:
+        cg = rng.choice(caregivers)
+        buca_cgs = [cg]
+        if rng.random() < multi_rate:
+            buca_cgs.append(rng.choice(caregivers))
+        jovie_client, jovie_cg = client, cg
+        roll = rng.random()
+        if roll < missing_rate / 2:
+            jovie_client = None
+        elif roll < typo_rate + missing_rate / 2:
+            jovie_client = _typo(rng, client)
+            if len(fixes) < corrections and rng.random() < 0.5:
+                fixes.append({'type': 'client', 'buca': client, 'jovie': jovie_client})
+        elif roll < typo_rate + mismatch_rate + missing_rate / 2:
+            if rng.random() < 0.5:
+                jovie_cg = _typo(rng, cg)
+                if len(fixes) < corrections and rng.random() < 0.25:
+                    fixes.append({'type': 'caregiver', 'buca': cg, 'jovie': jovie_cg})
+            else:
+                jovie_cg = rng.choice(caregivers)
+        elif roll < typo_rate + mismatch_rate + missing_rate:
+            # JOVIE-only client: BUCA never lists it
+            buca_cgs = None
+        if buca_cgs is not None:
+            sep = rng.choice(CAREGIVER_SEPARATORS)
+            buca_lines.append(
+                f"{client.upper() if rng.random() < 0.05 else client} {_case_number(rng)} "
+                f"Date: 08/{rng.randint(1, 28):02d}/2025 ESTCaregiver: {sep.join(buca_cgs)}"
+            )
+        if jovie_client is not None:
+            block = [jovie_client, jovie_cg, rng.choice(SHIFTS)]
+            if rng.random() < 0.05:
+                block.append('Note: confirmed by phone')
+            jovie_blocks.append('\n'.join(block))
+    rng.shuffle(jovie_blocks)
+    while len(fixes) < corrections:
+        fixes.append({'type': rng.choice(('client', 'caregiver')), 'buca': _name(rng), 'jovie': _name(rng)})
+    buca_text = '\n'.join(buca_lines)
+    jovie_text = '08/04/2025\n\n' + '\n\n'.join(jovie_blocks)
+    return buca_text, jovie_text, fixes
+
+
+# ---------------------------------------------------------------------------
+# Timing
+# ---------------------------------------------------------------------------
+
+def _measure(fn, repeat):
+    """
+    Runs fn() repeat times; returns (times, phase dicts, last return value).
+    fn receives a PhaseTimer it may mark.
+    """
+    times = []
+    phases = []
+    value = None
+    for _ in range(repeat):
+        timer = PhaseTimer()
+        start = time.perf_counter()
+        value = fn(timer)
+        times.append(time.perf_counter() - start)
+        phases.append(timer.phases)
+    return times, phases, value
+
+def _record(name, rows, times, phases=None, **extra):
+    record = {
+        'benchmark': name,
+        'rows': rows,
+        'best': min(times),
+        'median': statistics.median(times),
+        'runs': len(times),
+    }
+    if phases and phases[0]:
+        record['phases'] = {k: statistics.median(p.get(k, 0.0) for p in phases) for k in phases[0]}
+    record.update(extra)
+    return record
+
+def run_size(rows, args):
+    buca_text, jovie_text, corrections = generate(
+        rows, seed=args.seed, typo_rate=args.typo_rate, mismatch_rate=args.mismatch_rate,
+        missing_rate=args.missing_rate, multi_rate=args.multi_rate, corrections=args.corrections,
+    )
+    buca_lines = [line for line in buca_text.split('\n') if line.strip()]
+    out = []
+
+    times, _, _ = _measure(lambda t: [parse_buca_line(line) for line in buca_lines], args.repeat)
+    out.append(_record('parse_buca_line', rows, times, lines=len(buca_lines)))
+    # What /process_buca and /process_jovie do with a pasted body
+    times, _, buca_rows = _measure(lambda t: list(iter_buca_rows(buca_text)), args.repeat)
+    out.append(_record('process_buca', rows, times, parsedRows=len(buca_rows)))
+    times, _, jovie_rows = _measure(lambda t: list(JovieParser().rows(jovie_text)), args.repeat)
+    out.append(_record('process_jovie', rows, times, parsedRows=len(jovie_rows)))
+
+    buca_df, jovie_df = frames_from_rows(buca_rows, jovie_rows)
+    # /compare-style JSON rows, as the engines get them from engine_inputs
+    buca_json = [{'client': r['client'], 'caregivers': r['caregivers']} for r in buca_rows]
+    jovie_json = [{'client': r['client'], 'caregiver': r['caregiver']} for r in jovie_rows]
+
+    def corrections_run(timer):
+        index = compile_corrections(corrections)
+        timer.mark('compile')
+        for df in (buca_df.copy(), jovie_df.copy()):
+            apply_corrections(df, index, 'Caregiver')
+            apply_corrections(df, index, 'Client')
+        timer.mark('apply')
+    times, phases, _ = _measure(corrections_run, args.repeat)
+    out.append(_record('apply_corrections', rows, times, phases, corrections=len(corrections)))
+
+    for engine in args.engines:
+        if engine == 'loop' and rows > args.loop_limit:
+            out.append({'benchmark': f'compare.{engine}', 'rows': rows, 'skipped': 'above --loop-limit'})
+            continue
+        compare = COMPARE_ENGINES[engine]
+        similarity = SimilarityCache()
+        set_default_cache(similarity)
+
+        def compare_run(timer):
+            if not args.warm_similarity:
+                similarity.clear()
+            buca, jovie = engine_inputs(engine, buca_json, jovie_json)
+            timer.mark('inputs')
+            return compare(buca, jovie, corrections, timer=timer)
+        times, phases, results = _measure(compare_run, args.repeat)
+        out.append(_record(f'compare.{engine}', rows, times, phases, resultRows=len(results)))
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Parity check
+# ---------------------------------------------------------------------------
+
+def _result_rows(results):
+    # Engines emit rows in different orders; compare them as multisets
+    return Counter(repr(sorted(r.items())) for r in results)
+
+def parity(rows, args):
+    """
+    Differences on one generated roster, as (check, detail) pairs; empty if all agree.
+    Every engine and compare_incremental (cold, then reusing its state after a JOVIE
+    row is dropped) are checked against the loop engine, and FuzzyIndex.best_match
+    against difflib.get_close_matches for the names the fuzzy phase looks up.
+    """
+    buca_text, jovie_text, corrections = generate(
+        rows, seed=args.seed, typo_rate=args.typo_rate, mismatch_rate=args.mismatch_rate,
+        missing_rate=args.missing_rate, multi_rate=args.multi_rate, corrections=args.corrections,
+    )
+    buca_json = [{'client': r['client'], 'caregivers': r['caregivers']} for r in iter_buca_rows(buca_text)]
+    jovie_json = [{'client': r['client'], 'caregiver': r['caregiver']} for r in JovieParser().rows(jovie_text)]
+    set_default_cache(SimilarityCache())
+    diffs = []
+
+    def expect(name, want, got):
+        if want != got:
+            missing, extra = want - got, got - want
+            diffs.append((name, f"{sum(missing.values())} rows missing, {sum(extra.values())} extra"))
+
+    state = None
+    for label, jovie in (('cold', jovie_json), ('reused', jovie_json[1:])):
+        loop = _result_rows(COMPARE_ENGINES['loop'](*frames_from_rows(buca_json, jovie), corrections))
+        if label == 'cold':
+            for engine, compare in COMPARE_ENGINES.items():
+                if engine != 'loop':
+                    results = compare(*engine_inputs(engine, buca_json, jovie), corrections)
+                    expect(f'compare.{engine}', loop, _result_rows(results))
+        state, _ = compare_incremental(*frames_from_rows(buca_json, jovie), corrections, state)
+        expect(f'compare_incremental.{label}', loop, _result_rows(state.results()))
+
+    buca_names = {r['client'].strip().lower() for r in buca_json}
+    all_jovie_names = {r['client'].strip().lower() for r in jovie_json}
+    jovie_names = sorted(all_jovie_names - buca_names)
+    index = FuzzyIndex(jovie_names, scorer=SimilarityCache())
+    words = sorted(buca_names - all_jovie_names)
+    wrong = []
+    for word in words:
+        close = difflib.get_close_matches(word, jovie_names, n=1, cutoff=0.6)
+        if index.best_match(word, 0.6) != (close[0] if close else None):
+            wrong.append(word)
+    if wrong:
+        diffs.append(('fuzzy_index', f"{len(wrong)} of {len(words)} lookups differ, e.g. {wrong[0]!r}"))
+    return diffs
+
+
+# ---------------------------------------------------------------------------
+# Regression check
+# ---------------------------------------------------------------------------
+
+def regressions(baseline, results, tolerance):
+    """
+    (benchmark, rows, old best, new best) for every benchmark that got more than
+    `tolerance` (a fraction) slower than in the baseline results.
+    """
+    old = {(r['benchmark'], r['rows']): r for r in baseline.get('results', []) if 'best' in r}
+    slower = []
+    for r in results:
+        prev = old.get((r['benchmark'], r['rows']))
+        if prev and 'best' in r and r['best'] > prev['best'] * (1 + tolerance):
+            slower.append((r['benchmark'], r['rows'], prev['best'], r['best']))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated row counts (default: %(default)s)')
+    parser.add_argument('--engines', default=','.join(COMPARE_ENGINES),
+                        help='comma-separated compare engines (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--typo-rate', type=float, default=0.1)
+    parser.add_argument('--mismatch-rate', type=float, default=0.15)
+    parser.add_argument('--missing-rate', type=float, default=0.05)
+    parser.add_argument('--multi-rate', type=float, default=0.2)
+    parser.add_argument('--corrections', type=int, default=50, help='size of the corrections list')
+    parser.add_argument('--loop-limit', type=int, default=LOOP_LIMIT)
+    parser.add_argument('--warm-similarity', action='store_true',
+                        help='keep name-pair similarity scores between compare runs')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    parser.add_argument('--baseline', help='earlier --output file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown against --baseline (default: %(default)s)')
+    parser.add_argument('--check', action='store_true',
+                        help='compare engine results instead of timing them; exit 1 on differences')
+    args = parser.parse_args(argv)
+    args.engines = [e for e in args.engines.split(',') if e]
+    unknown = [e for e in args.engines if e not in COMPARE_ENGINES]
+    if unknown:
+        parser.error(f"unknown engine(s): {', '.join(unknown)}")
+
+    if args.check:
+        failed = False
+        for rows in (int(s) for s in args.sizes.split(',') if s):
+            diffs = parity(rows, args)
+            for name, detail in diffs:
+                print(f"parity: {name} @ {rows} rows: {detail}", file=sys.stderr)
+            print(f"parity: {rows} rows {'differ' if diffs else 'ok'}", file=sys.stderr)
+            failed = failed or bool(diffs)
+        return 1 if failed else 0
+
+    baseline = None
+    if args.baseline:
+        # Read first: --output may overwrite the same file
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = []
+    for rows in (int(s) for s in args.sizes.split(',') if s):
+        print(f"benchmark: {rows} rows", file=sys.stderr)
+        results.extend(run_size(rows, args))
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if baseline is not None:
+        slower = regressions(baseline, results, args.tolerance)
+        for name, rows, old, new in slower:
+            print(f"regression: {name} @ {rows} rows {old:.4f}s -> {new:.4f}s", file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
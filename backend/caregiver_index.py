@@ -0,0 +1,58 @@
+from functools import lru_cache
+
+from parsers import BUCA_CAREGIVER_SPLIT_RE
+
+
+def split_caregivers(value):
+    """
+    Individual caregivers in a BUCA caregiver field, split the way parse_buca_line
+    splits ESTCaregiver: lists (and the ', '-joined strings /compare builds from them).
+    """
+    return [cg.strip() for cg in BUCA_CAREGIVER_SPLIT_RE.split(str(value)) if cg.strip()]
+
+
+@lru_cache(maxsize=65536)
+def caregiver_members(caregiver):
+    """
+    {normalized name: spelling} of the caregivers in one caregiver field (a str).
+    Memoized: rosters repeat the same fields, so treat the result as read-only.
+    """
+    members = {}
+    for name in split_caregivers(caregiver):
+        members.setdefault(name.lower(), name)
+    return members
+
+
+def listed_caregiver(caregiver, cg_lc):
+    """
+    Spelling of caregiver cg_lc if the caregiver field lists it, else None.
+    """
+    return caregiver_members(str(caregiver)).get(cg_lc)
+
+
+class CaregiverIndex:
+    """
+    Inverted index over BUCA rows: normalized individual caregiver -> the BUCA clients
+    listing them, so "which BUCA client has this caregiver" is a dict lookup.
+    rows: (client_lc, client, caregiver field) per BUCA row.
+    """
+
+    def __init__(self, rows=()):
+        self._spelling = {}
+        self._clients = {}
+        for client_lc, client, caregiver in rows:
+            self.add(client_lc, client, caregiver)
+
+    def add(self, client_lc, client, caregiver):
+        for cg_lc, spelling in caregiver_members(str(caregiver)).items():
+            self._spelling.setdefault(cg_lc, spelling)
+            self._clients.setdefault(cg_lc, {})[client_lc] = client
+
+    def spelling(self, cg_lc):
+        return self._spelling.get(cg_lc)
+
+    def clients(self, cg_lc):
+        """
+        {client_lc: client} of the BUCA clients listing caregiver cg_lc.
+        """
+        return self._clients.get(cg_lc, {})
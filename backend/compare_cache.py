@@ -0,0 +1,85 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def frame_digest(df):
+    """
+    Stable hash of the Client/Caregiver columns of a standardized BUCA or JOVIE frame,
+    or of a utils.RowRecord list.
+    Other columns (row numbers, raw text, case numbers) don't affect the comparison.
+    """
+    if isinstance(df, list):
+        return _records_digest(df)
+    cols = [c for c in ('Client', 'Caregiver') if c in df.columns]
+    h = hashlib.sha256(','.join(cols).encode('utf-8'))
+    if not cols:
+        # Nothing to hash row by row (a frame without those columns matches nothing)
+        h.update(str(len(df)).encode('utf-8'))
+        return h.hexdigest()
+    # repr per row like _records_digest: pandas' own hashing maps 1 and '1', or None
+    # and NaN, to the same value, and the engines treat those differently
+    for row in zip(*(df[c].tolist() for c in cols)):
+        h.update(repr(row).encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+def _records_digest(records):
+    h = hashlib.sha256(b'records')
+    for r in records:
+        h.update(repr((r.client, r.caregiver)).encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+def compare_key(buca_df, jovie_df, corrections_version, engine):
+    return f"{engine}:{corrections_version}:{frame_digest(buca_df)}:{frame_digest(jovie_df)}"
+
+
+class LRUCache:
+    """
+    Bounded LRU with hit/miss counters (compare results keyed by compare_key(),
+    parsed upload frames keyed by content hash). Cached values are shared between
+    hits, so callers must not mutate them.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return results
+
+    def put(self, key, results):
+        with self._lock:
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,199 @@
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from timing import PhaseTimer
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+# Seconds between progress writes to the store (and cross-worker cancel checks)
+PROGRESS_INTERVAL = 0.5
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _status_key(job_id):
+    return f'compare_job:{job_id}'
+
+
+def _result_key(job_id):
+    return f'compare_job_result:{job_id}'
+
+
+def _cancel_key(job_id):
+    return f'compare_job_cancel:{job_id}'
+
+
+class JobTimer(PhaseTimer):
+    """
+    PhaseTimer that publishes a job's phase times and progress while it runs, and
+    raises JobCancelled from the next mark/progress call once cancel was requested.
+    """
+
+    def __init__(self, jobs, job_id, cancelled):
+        super().__init__()
+        self._jobs = jobs
+        self._job_id = job_id
+        self._cancelled = cancelled
+        self._next_report = 0.0
+
+    def mark(self, name):
+        super().mark(name)
+        self._report(None, force=True)
+
+    def progress(self, phase, done, total):
+        self._report({'phase': phase, 'done': done, 'total': total})
+
+    def _report(self, progress, force=False):
+        if self._cancelled.is_set():
+            raise JobCancelled()
+        now = time.monotonic()
+        if not force and now < self._next_report:
+            return
+        self._next_report = now + PROGRESS_INTERVAL
+        # Cancel may have been requested through another worker
+        if self._jobs.store.get(_cancel_key(self._job_id)):
+            self._cancelled.set()
+            raise JobCancelled()
+        self._jobs._update(self._job_id, phases=dict(self.phases), progress=progress)
+
+
+class CompareJobs:
+    """
+    Runs compares in the background on a bounded thread pool so the request that
+    submits one returns at once. At most workers jobs run and max_queued wait;
+    submit() raises JobQueueFull beyond that.
+
+    Job status, results and cancel requests live in store (the app's shared state),
+    so with the SQLite backend any worker can answer a poll or cancel a job another
+    worker runs. Each worker keeps the keep most recent jobs it finished and removes
+    older ones from the store.
+    """
+
+    def __init__(self, store, workers=2, max_queued=8, keep=16):
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.keep = keep
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._cancel_events = {}
+        self._finished = deque()
+        self._outcomes = Counter()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='compare-job')
+            return self._pool
+
+    def submit(self, fn, **info):
+        """
+        Queues fn(timer) -> results and returns the new job's status.
+        info: extra fields for the status (engine, row counts, ...).
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.max_queued:
+                raise JobQueueFull(f'{self._pending} compare jobs already queued or running')
+            self._pending += 1
+        job_id = uuid.uuid4().hex
+        status = dict(info, id=job_id, state=QUEUED, createdAt=_now(), phases={}, progress=None)
+        self.store[_status_key(job_id)] = status
+        try:
+            self._get_pool().submit(self._run, job_id, fn)
+        except RuntimeError:
+            # Pool shut down (interpreter exiting)
+            with self._lock:
+                self._pending -= 1
+            raise
+        return status
+
+    def status(self, job_id):
+        return self.store.get(_status_key(job_id))
+
+    def result(self, job_id):
+        return self.store.get(_result_key(job_id))
+
+    def cancel(self, job_id):
+        """
+        Requests cancellation; a queued job never starts, a running one stops at its
+        next progress report. Returns the job's status, None if unknown.
+        """
+        status = self.status(job_id)
+        if status is None or status['state'] in FINAL_STATES:
+            return status
+        self.store[_cancel_key(job_id)] = True
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+        return dict(status, cancelRequested=True)
+
+    def _update(self, job_id, **fields):
+        # Only the thread running a job writes its status after submit()
+        status = dict(self.store.get(_status_key(job_id)) or {})
+        status.update(fields)
+        self.store[_status_key(job_id)] = status
+
+    def _run(self, job_id, fn):
+        cancelled = threading.Event()
+        with self._lock:
+            self._cancel_events[job_id] = cancelled
+        timer = JobTimer(self, job_id, cancelled)
+        state = FAILED
+        try:
+            if self.store.get(_cancel_key(job_id)):
+                raise JobCancelled()
+            self._update(job_id, state=RUNNING, startedAt=_now())
+            results = fn(timer)
+            self.store[_result_key(job_id)] = results
+            state = DONE
+            self._update(job_id, state=DONE, finishedAt=_now(), phases=timer.phases, progress=None,
+                         resultRows=len(results))
+        except JobCancelled:
+            state = CANCELLED
+            self._update(job_id, state=CANCELLED, finishedAt=_now(), phases=timer.phases)
+        except Exception as e:
+            print(f"Compare job {job_id} failed: {e}")
+            self._update(job_id, state=FAILED, finishedAt=_now(), phases=timer.phases, error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._cancel_events.pop(job_id, None)
+                self._outcomes[state] += 1
+                self._finished.append(job_id)
+                expired = []
+                while len(self._finished) > self.keep:
+                    expired.append(self._finished.popleft())
+            for old in expired:
+                for key in (_status_key(old), _result_key(old), _cancel_key(old)):
+                    self.store.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'maxQueued': self.max_queued,
+                'pending': self._pending,
+                'running': len(self._cancel_events),
+                'finished': dict(self._outcomes),
+            }
@@ -0,0 +1,245 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows dev boxes run a single process; the in-process lock is enough there
+    fcntl = None
+
+FIELDS = ('type', 'buca', 'jovie')
+
+
+def correction_key(correction):
+    return tuple(correction.get(k) for k in FIELDS)
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _file_ino(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+class CorrectionsJournal:
+    """
+    Corrections kept in memory keyed on (type, buca, jovie) and persisted as a
+    snapshot file (the plain corrections.json list) plus an append-only journal of
+    add/delete records. Edits only append one line; the journal is folded back into
+    the snapshot atomically every compact_every records and on startup.
+
+    Several processes (gunicorn workers) can share the files: writers hold an
+    exclusive file lock, and refresh() catches up with records other processes
+    appended, reloading from scratch after another process compacted.
+    generation changes whenever the in-memory corrections change.
+
+    version counts changes to the corrections and lives in the files: each journal
+    record carries the version it produced, and compaction starts the new journal
+    with a version record. Every process reading the files agrees on it.
+    """
+
+    def __init__(self, snapshot_path, journal_path, compact_every=500):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.generation = 0
+        self.version = 0
+        self._entries = {}
+        self._journal_records = 0
+        self._offset = 0
+        self._snapshot_sig = None
+        self._journal_ino = None
+        self._lock = threading.Lock()
+
+    def corrections(self):
+        return list(self._entries.values())
+
+    def load(self):
+        """
+        Read the snapshot, replay the journal on top of it and compact.
+        Returns the resulting corrections list.
+        """
+        with self._locked():
+            self._reload()
+            if self._journal_records:
+                self._compact()
+        return self.corrections()
+
+    def refresh(self):
+        """
+        Apply changes made by other processes since the last call; cheap (two stats)
+        when nothing changed. Returns True if the corrections changed.
+        """
+        with self._lock:
+            return self._catch_up()
+
+    def add(self, correction):
+        """
+        Add a correction; returns False if the same (type, buca, jovie) already exists.
+        """
+        key = correction_key(correction)
+        with self._locked():
+            self._catch_up()
+            if key in self._entries:
+                return False
+            self._entries[key] = correction
+            self.generation += 1
+            self.version += 1
+            self._append({'op': 'add', 'correction': correction, 'version': self.version})
+        return True
+
+    def delete(self, correction):
+        """
+        Remove a correction by (type, buca, jovie); returns the number removed.
+        """
+        key = correction_key(correction)
+        if key[0] is None:
+            return 0
+        with self._locked():
+            self._catch_up()
+            if self._entries.pop(key, None) is None:
+                return 0
+            self.generation += 1
+            self.version += 1
+            self._append({'op': 'delete', 'correction': {k: correction.get(k) for k in FIELDS}, 'version': self.version})
+        return 1
+
+    def replace(self, corrections):
+        """
+        Replace the whole list (POST /corrections); written straight to the snapshot.
+        """
+        with self._locked():
+            self._catch_up()
+            self._entries = {correction_key(c): c for c in corrections}
+            self.generation += 1
+            self.version += 1
+            self._compact()
+
+    def compact(self):
+        with self._locked():
+            self._catch_up()
+            self._compact()
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.journal_path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reload(self):
+        # Signature first: if a compaction lands while reading, the next check reloads again
+        self._snapshot_sig = _file_signature(self.snapshot_path)
+        self._entries = {}
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                for c in json.load(f):
+                    self._entries[correction_key(c)] = c
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        self._offset = 0
+        self.version = 0
+        self._journal_ino = _file_ino(self.journal_path)
+        self._journal_records = self._replay()
+        self.generation += 1
+
+    def _catch_up(self):
+        if _file_signature(self.snapshot_path) != self._snapshot_sig:
+            self._reload()
+            return True
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            st = None
+        size = st.st_size if st else 0
+        if st and self._journal_ino is not None and st.st_ino != self._journal_ino:
+            # Replaced by another process's compaction
+            self._reload()
+            return True
+        if size == self._offset:
+            return False
+        if size < self._offset:
+            self._reload()
+            return True
+        records = self._replay()
+        self._journal_records += records
+        if records:
+            self.generation += 1
+        return bool(records)
+
+    def _replay(self):
+        """
+        Apply complete journal records from the current offset; returns how many.
+        """
+        records = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Record still being written by another process, read it next time
+                        break
+                    self._offset += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn line from an interrupted write
+                        continue
+                    # Records written before versions were kept count one each
+                    self.version = max(self.version, record.get('version', self.version + 1))
+                    if record.get('op') == 'version':
+                        continue
+                    c = record.get('correction') or {}
+                    if record.get('op') == 'add':
+                        self._entries.setdefault(correction_key(c), c)
+                    elif record.get('op') == 'delete':
+                        self._entries.pop(correction_key(c), None)
+                    records += 1
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _append(self, record):
+        # One write() per record on an O_APPEND handle keeps concurrent appends whole
+        with open(self.journal_path, 'ab') as f:
+            f.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+            self._offset = f.tell()
+        if self._journal_ino is None:
+            self._journal_ino = _file_ino(self.journal_path)
+        self._journal_records += 1
+        if self._journal_records >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        tmp = f"{self.snapshot_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.corrections(), f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        # Replaying a journal already folded into the snapshot is harmless, so a crash
+        # between these two steps loses nothing. The new journal only keeps the version.
+        tmp = f"{self.journal_path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write((json.dumps({'op': 'version', 'version': self.version}) + '\n').encode('utf-8'))
+            self._offset = f.tell()
+        os.replace(tmp, self.journal_path)
+        self._snapshot_sig = _file_signature(self.snapshot_path)
+        self._journal_ino = _file_ino(self.journal_path)
+        self._journal_records = 0
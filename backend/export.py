@@ -0,0 +1,95 @@
+import csv
+from io import StringIO
+
+# (result key, header) in export order
+EXPORT_COLUMNS = [
+    ('source', 'Source'),
+    ('client', 'Client'),
+    ('caregiver', 'Caregiver'),
+    ('match_type', 'Match Type'),
+    ('tag', 'Tag'),
+    ('confidence', 'Confidence'),
+]
+
+# Sheet name and fill colour per tag, matching the Compare tab colours
+TAG_SHEETS = {
+    'exact_match': ('Exact Match', 'C6EFCE'),
+    'verify_cg': ('Verify Which CG', 'BDD7EE'),
+    'temp_mismatch': ('Temporary Mismatch', 'E4DFEC'),
+    'diff_caregiver_mismatch': ('Caregiver Mismatch', 'FFEB9C'),
+    'complete_mismatch': ('Complete Mismatch', 'FFC7CE'),
+}
+OTHER_SHEET = 'Other'
+
+# Rows buffered per chunk when streaming CSV
+CSV_CHUNK_ROWS = 500
+
+
+def _values(r):
+    return [r.get(key, '') for key, _ in EXPORT_COLUMNS]
+
+
+def iter_csv(results):
+    """
+    CSV text for the results, yielded in chunks so large exports stream.
+    """
+    buf = StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([header for _, header in EXPORT_COLUMNS])
+    for i, r in enumerate(results, 1):
+        writer.writerow(_values(r))
+        if i % CSV_CHUNK_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def write_xlsx(results, fileobj, by_tag=False, colors=True):
+    """
+    Write the results to fileobj as an .xlsx workbook in openpyxl write-only mode,
+    so rows go straight to disk instead of being held as cells.
+    by_tag puts each tag on its own sheet; colors fills each row with its tag colour.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+
+    wb = Workbook(write_only=True)
+    sheets = {}
+    header_font = Font(bold=True)
+    fills = {tag: PatternFill('solid', start_color=color) for tag, (_, color) in TAG_SHEETS.items()}
+
+    def sheet_for(title):
+        ws = sheets.get(title)
+        if ws is None:
+            ws = sheets[title] = wb.create_sheet(title)
+            header = []
+            for _, name in EXPORT_COLUMNS:
+                cell = WriteOnlyCell(ws, value=name)
+                cell.font = header_font
+                header.append(cell)
+            ws.append(header)
+        return ws
+
+    if not by_tag:
+        sheet_for('Results')
+    for r in results:
+        tag = r.get('tag')
+        if by_tag:
+            ws = sheet_for(TAG_SHEETS[tag][0] if tag in TAG_SHEETS else OTHER_SHEET)
+        else:
+            ws = sheets['Results']
+        fill = fills.get(tag) if colors else None
+        if fill is None:
+            ws.append(_values(r))
+            continue
+        row = []
+        for value in _values(r):
+            cell = WriteOnlyCell(ws, value=value)
+            cell.fill = fill
+            row.append(cell)
+        ws.append(row)
+    if not sheets:
+        sheet_for('Results')
+    wb.save(fileobj)
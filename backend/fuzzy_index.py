@@ -0,0 +1,197 @@
+import bisect
+from collections import Counter
+
+from similarity import default_cache
+
+# How many candidates are scored first per lookup; the best of them sets the bar
+# the rest of the pool must reach on its bounds
+DEFAULT_TOP_K = 8
+# Longest word the vectorized LCS bound handles (one bit per character)
+MAX_BOUND_WORD = 64
+
+
+class FuzzyIndex:
+    """
+    A shrinking pool of names held as numpy tables, for nearest-name lookups.
+
+    best_match() returns what difflib.get_close_matches(word, names, n=1, cutoff)
+    would return without running SequenceMatcher on every name. Two upper bounds on
+    SequenceMatcher's ratio, computed for the whole pool at once, decide what gets
+    scored: shared character counts (cheap, one vector per distinct letter of the
+    word) and the LCS (bit-parallel, only for names that pass the first). The top_k
+    names by the first bound are scored up front and set the bar the rest must reach.
+    Scores go through a SimilarityCache (the process-wide one by default), so pairs
+    seen in earlier runs aren't rescored.
+
+    Each lookup is still one vectorized pass over the names in its length window,
+    so matching m words against n names costs O(n*m) array work; only the names
+    that pass the bounds reach SequenceMatcher.
+    """
+
+    def __init__(self, names=(), top_k=DEFAULT_TOP_K, scorer=None):
+        self.top_k = top_k
+        self.scorer = scorer or default_cache()
+        self._names = set()
+        self._table = None
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def add(self, name):
+        if name in self._names:
+            return
+        self._names.add(name)
+        self._table = None
+
+    def remove(self, name):
+        if name not in self._names:
+            return
+        self._names.discard(name)
+        if self._table is not None:
+            self._table.alive[self._table.rows[name]] = False
+
+    def candidates(self, word, cutoff=0.6):
+        """
+        Names sharing the most characters with word, best first (at most top_k).
+        """
+        if not word:
+            return sorted(self._names)[:self.top_k]
+        table = self._table_for()
+        _, rows = _best_first(*table.char_bounds(word, cutoff))
+        return [table.names[r] for r in rows[:self.top_k]]
+
+    def best_match(self, word, cutoff=0.6):
+        """
+        Closest indexed name scoring at least cutoff, or None.
+        Scores and ties are resolved exactly like difflib.get_close_matches(n=1).
+        """
+        if not word:
+            # No length window or bounds for an empty word: score every name
+            return self._best_of([(1.0, name) for name in sorted(self._names)], word, None, cutoff)
+        table = self._table_for()
+        bounds, rows = _best_first(*table.char_bounds(word, cutoff))
+        k = self.top_k
+        best = self._best_of(table.pairs(bounds[:k], rows[:k]), word, None, cutoff)
+        bounds, rows = bounds[k:], rows[k:]
+        if best is not None:
+            rows = rows[bounds >= best[0]]
+            bounds = bounds[bounds >= best[0]]
+        if len(rows) and len(word) <= MAX_BOUND_WORD:
+            # The LCS bound is tighter; only computed for what the character counts let through
+            bounds, rows = _best_first(table.lcs_bounds(word, rows), rows)
+        best = self._best_of(table.pairs(bounds, rows), word, best, cutoff)
+        return best[1] if best else None
+
+    def _best_of(self, bounded, word, best, cutoff):
+        """
+        Best (ratio, name) after scoring (bound, name) pairs given highest bound first,
+        stopping once no bound can tie or beat it.
+        """
+        for bound, name in bounded:
+            if best is not None and bound < best[0]:
+                break
+            # Once something matched, only names that can tie or beat it are scored
+            ratio = self.scorer.score(name, word, best[0] if best else cutoff)
+            if ratio is not None and (best is None or (ratio, name) > best):
+                best = (ratio, name)
+        return best
+
+    def _table_for(self):
+        if self._table is None:
+            self._table = _BoundTable(self._names)
+        return self._table
+
+
+def _best_first(bounds, rows):
+    """
+    bounds and their rows, highest bound first (ties in table order).
+    """
+    import numpy as np
+    order = np.argsort(-bounds, kind='stable')
+    return bounds[order], rows[order]
+
+
+class _BoundTable:
+    """
+    The pool's names sorted by length, as per-letter counts (for the shared
+    character bound) and as rows of character codes (for the bit-parallel LCS
+    bound over numpy uint64 lanes, the word's characters as the bits).
+    """
+
+    def __init__(self, names):
+        import numpy as np
+        self.names = sorted(names, key=lambda name: (len(name), name))
+        self.rows = {name: i for i, name in enumerate(self.names)}
+        self.lengths = [len(name) for name in self.names]
+        self.sizes = np.asarray(self.lengths, dtype=np.float64)
+        self.alive = np.ones(len(self.names), dtype=bool)
+        self.alphabet = {}
+        width = self.lengths[-1] if self.names else 0
+        # Column-major: one row of codes per character position; 0 pads short names
+        self.codes = np.zeros((width, len(self.names)), dtype=np.int32)
+        for i, name in enumerate(self.names):
+            self.codes[:len(name), i] = [self.alphabet.setdefault(ch, len(self.alphabet) + 1) for ch in name]
+        # One row of counts per letter, so a letter's counts across the pool are contiguous
+        self.counts = np.zeros((len(self.alphabet) + 1, len(self.names)), dtype=np.int32)
+        np.add.at(self.counts, (self.codes, np.arange(len(self.names))), 1)
+
+    def window(self, lw, threshold):
+        """
+        Rows whose length can reach threshold against a word of length lw:
+        2*min(la, lw)/(la + lw) >= threshold.
+        """
+        lo = bisect.bisect_left(self.lengths, lw * threshold / (2.0 - threshold) - 1e-9)
+        hi = bisect.bisect_right(self.lengths, lw * (2.0 - threshold) / threshold + 1e-9) if threshold > 0 else len(self.names)
+        return lo, max(lo, hi)
+
+    def pairs(self, bounds, rows):
+        return zip(bounds.tolist(), (self.names[r] for r in rows))
+
+    def char_bounds(self, word, threshold):
+        """
+        (bounds, rows) for the live names whose shared character count bound reaches
+        threshold. The bound is never below the LCS bound, nor that below the ratio.
+        """
+        import numpy as np
+        lw = len(word)
+        lo, hi = self.window(lw, threshold)
+        shared = np.zeros(hi - lo, dtype=np.int32)
+        for ch, n in Counter(word).items():
+            code = self.alphabet.get(ch)
+            if code is not None:
+                shared += np.minimum(self.counts[code, lo:hi], n)
+        bounds = 2.0 * shared / (self.sizes[lo:hi] + lw)
+        keep = np.flatnonzero(self.alive[lo:hi] & (bounds >= threshold))
+        return bounds[keep], keep + lo
+
+    def lcs_bounds(self, word, rows):
+        """
+        2*LCS(word, name)/(len(word) + len(name)) for the given rows; len(word) <= 64.
+        """
+        import numpy as np
+        lw = len(word)
+        masks = np.zeros(len(self.alphabet) + 1, dtype=np.uint64)
+        for i, ch in enumerate(word):
+            code = self.alphabet.get(ch)
+            if code is not None:
+                masks[code] |= np.uint64(1 << i)
+        full = np.uint64((1 << lw) - 1)
+        v = np.full(len(rows), full, dtype=np.uint64)
+        lengths = self.sizes[rows]
+        for column in self.codes[:int(lengths.max()), rows]:
+            u = v & masks[column]
+            v = (v + u) | (v - u)
+        lcs = lw - _popcount(v & full)
+        return 2.0 * lcs / (lengths + lw)
+
+
+def _popcount(values):
+    import numpy as np
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+    return np.unpackbits(values.view(np.uint8)).reshape(len(values), 64).sum(axis=1)
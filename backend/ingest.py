@@ -0,0 +1,94 @@
+import csv
+import hashlib
+from io import BytesIO, StringIO
+
+# Accepted (case-insensitive) header names for each standardized column, in priority order
+COLUMN_ALIASES = {
+    'Client': ('client', 'name'),
+    'Caregiver': ('caregiver', 'caregivers'),
+}
+CSV_EXTENSIONS = ('.csv', '.txt')
+ZIP_MAGIC = b'PK\x03\x04'
+
+
+def _pick_columns(headers):
+    """
+    Position of the Client and Caregiver columns in headers, or None if either is missing.
+    """
+    lowered = [str(h).strip().lower() if h is not None else '' for h in headers]
+    picked = {}
+    for target, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                picked[target] = lowered.index(alias)
+                break
+        else:
+            return None
+    return picked
+
+
+def _frame(picked, rows):
+    import pandas as pd
+    cols = list(picked)
+    idx = [picked[c] for c in cols]
+    records = []
+    for row in rows:
+        values = [row[i] if i < len(row) else None for i in idx]
+        # Trailing formatted-but-empty rows are common in exported workbooks
+        if all(v is None or v == '' for v in values):
+            continue
+        records.append(values)
+    return pd.DataFrame(records, columns=cols)
+
+
+def _read_xlsx(content):
+    from openpyxl import load_workbook
+    wb = load_workbook(BytesIO(content), read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        picked = _pick_columns(next(rows, ()))
+        return None if picked is None else _frame(picked, rows)
+    finally:
+        wb.close()
+
+
+def _read_csv(content):
+    reader = csv.reader(StringIO(content.decode('utf-8-sig', errors='replace')))
+    picked = _pick_columns(next(reader, []))
+    return None if picked is None else _frame(picked, reader)
+
+
+def _read_other(content):
+    # Anything else (e.g. legacy .xls) goes through pandas as before
+    import pandas as pd
+    df = pd.read_excel(BytesIO(content))
+    picked = _pick_columns(list(df.columns))
+    if picked is None:
+        return None
+    return df.iloc[:, list(picked.values())].set_axis(list(picked), axis=1)
+
+
+def read_upload(file, label, cache):
+    """
+    Standardized Client/Caregiver frame for an uploaded Excel or CSV file.
+    Only those two columns are read (workbooks in read-only streaming mode), and the
+    result is cached (cache: compare_cache.LRUCache) on the file's content hash so
+    re-uploads skip parsing entirely.
+    Raises ValueError if the file lacks the columns.
+    """
+    content = file.read()
+    key = hashlib.sha256(content).hexdigest()
+    df = cache.get(key)
+    if df is not None:
+        return df
+    name = (file.filename or '').lower()
+    if name.endswith(CSV_EXTENSIONS) or file.mimetype == 'text/csv':
+        df = _read_csv(content)
+    elif content.startswith(ZIP_MAGIC):
+        df = _read_xlsx(content)
+    else:
+        df = _read_other(content)
+    if df is None:
+        raise ValueError(f'{label} file must have columns: Client and Caregiver')
+    cache.put(key, df)
+    return df
@@ -0,0 +1,91 @@
+import threading
+from bisect import bisect_left
+
+# Upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """
+    Minimal in-process counters and duration histograms rendered in the Prometheus
+    text format. Each metric is declared once with its help text; samples are keyed
+    by their label values. Values are per process, so with several workers each one
+    reports its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def counter(self, name, help_text):
+        self._meta[name] = ('counter', help_text)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets=DURATION_BUCKETS):
+        self._meta[name] = ('histogram', help_text)
+        self._histograms.setdefault(name, (tuple(buckets), {}))
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            samples = self._counters[name]
+            samples[key] = samples.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        buckets, samples = self._histograms[name]
+        with self._lock:
+            sample = samples.get(key)
+            if sample is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                sample = samples[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            sample[0][bisect_left(buckets, value)] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def render(self, collected=()):
+        """
+        Prometheus exposition text. collected: extra (name, type, help, [(labels dict, value)])
+        read at scrape time, e.g. cache sizes and hit counts kept elsewhere.
+        """
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in self._meta.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                if kind == 'counter':
+                    for key, value in self._counters[name].items():
+                        lines.append(f'{name}{_labels(key)} {_number(value)}')
+                    continue
+                buckets, samples = self._histograms[name]
+                for key, (counts, total, count) in samples.items():
+                    running = 0
+                    for bound, n in zip(buckets + (float('inf'),), counts):
+                        running += n
+                        lines.append(f'{name}_bucket{_labels(key + (("le", _number(bound)),))} {running}')
+                    lines.append(f'{name}_sum{_labels(key)} {_number(total)}')
+                    lines.append(f'{name}_count{_labels(key)} {count}')
+        for name, kind, help_text, samples in collected:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{_labels(tuple(sorted(labels.items())))} {_number(value)}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,200 @@
+import json
+import os
+import sqlite3
+import threading
+
+KINDS = ('client', 'caregiver')
+# Keys per SELECT ... IN (...), below SQLite's bound-parameter limit
+LOOKUP_BATCH = 500
+
+
+def normalize_name(name):
+    """
+    Registry key for a name: trimmed, inner whitespace collapsed, lowercased
+    (the same rule as normalizeName in the frontend's NameIDRegistryPanel).
+    """
+    return ' '.join(str(name).split()).lower()
+
+
+class NameRegistry:
+    """
+    Interns normalized client/caregiver names to stable integer IDs, persisted in an
+    embedded SQLite database and served from an in-memory hash index, so repeat
+    lookups never touch the database. IDs are never reused or renumbered; several
+    workers can intern concurrently against the same file.
+
+    The same database holds the curated UID map the Name/ID Registry panel edits
+    ({'<kind>:<normalized name>': 'UID-0001-MAST'}), versioned so each worker reloads
+    it only after another one replaced it.
+    """
+
+    def __init__(self, path, legacy_uids_path=None):
+        self.path = path
+        self._ids = {}
+        self._lock = threading.Lock()
+        self._conns = threading.local()
+        self._uid_map = {}
+        self._uid_version = None
+        with self._conn() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS names ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, key TEXT NOT NULL, '
+                'name TEXT NOT NULL, UNIQUE (kind, key))'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS uid_map (key TEXT PRIMARY KEY, uid TEXT NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('uid_map_version', 0)")
+        if legacy_uids_path:
+            self._import_legacy(legacy_uids_path)
+
+    def _conn(self):
+        conn = getattr(self._conns, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._conns.conn = conn
+        return conn
+
+    def _import_legacy(self, path):
+        # One-off: seed an empty table from the uids.json file the registry used before
+        if self._conn().execute('SELECT 1 FROM uid_map LIMIT 1').fetchone() is not None:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if isinstance(legacy, dict) and legacy:
+            self.replace_uid_map(legacy)
+
+    # --- Interning ---
+
+    def intern(self, kind, names):
+        """
+        Stable ID for each name in names (same order), assigning IDs to new ones.
+        Names that normalize to the same key share an ID; empty names get None.
+        """
+        keys = [normalize_name(n) if n is not None else '' for n in names]
+        missing = {}
+        with self._lock:
+            for name, key in zip(names, keys):
+                if key and (kind, key) not in self._ids:
+                    missing.setdefault(key, str(name).strip())
+        if missing:
+            self._assign(kind, missing)
+        ids = self._ids
+        return [ids.get((kind, key)) if key else None for key in keys]
+
+    def _assign(self, kind, missing):
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO names (kind, key, name) VALUES (?, ?, ?)',
+                [(kind, key, name) for key, name in missing.items()],
+            )
+        # Another worker may have interned some of these first: read the IDs back
+        keys = list(missing)
+        found = {}
+        for i in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[i:i + LOOKUP_BATCH]
+            rows = conn.execute(
+                f"SELECT key, id FROM names WHERE kind = ? AND key IN ({','.join('?' * len(batch))})",
+                [kind, *batch],
+            )
+            found.update(rows)
+        with self._lock:
+            for key, name_id in found.items():
+                self._ids[(kind, key)] = name_id
+
+    def names(self, kind=None):
+        """
+        [{id, kind, key, name}] for every interned name (name: first spelling seen).
+        """
+        sql = 'SELECT id, kind, key, name FROM names'
+        args = ()
+        if kind:
+            sql += ' WHERE kind = ?'
+            args = (kind,)
+        rows = self._conn().execute(sql + ' ORDER BY id', args)
+        return [{'id': r[0], 'kind': r[1], 'key': r[2], 'name': r[3]} for r in rows]
+
+    # --- Curated UID map ---
+
+    def _uid_map_version(self):
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'uid_map_version'").fetchone()[0]
+
+    def uid_map(self):
+        version = self._uid_map_version()
+        with self._lock:
+            if version == self._uid_version:
+                return self._uid_map
+        uid_map = dict(self._conn().execute('SELECT key, uid FROM uid_map'))
+        with self._lock:
+            self._uid_map = uid_map
+            self._uid_version = version
+        return uid_map
+
+    def replace_uid_map(self, uid_map):
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM uid_map')
+            conn.executemany(
+                'INSERT INTO uid_map (key, uid) VALUES (?, ?)',
+                [(str(k), str(v)) for k, v in uid_map.items() if v is not None and v != ''],
+            )
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'uid_map_version'")
+
+    def uid_for(self, kind, name, uid_map=None):
+        if name is None:
+            return None
+        uid_map = self.uid_map() if uid_map is None else uid_map
+        return uid_map.get(f'{kind}:{normalize_name(name)}')
+
+    # --- Rows ---
+
+    def resolve_rows(self, rows):
+        """
+        /uids/resolve: each BUCA/JOVIE row with clientId/caregiverId (caregiverIds for a
+        BUCA caregivers list) and, where the curated map has one, clientUID/caregiverUID.
+        BUCA rows also get originalCaregiver (their first caregiver) so callers keyed
+        on a single caregiver name can map it.
+        """
+        rows = [r for r in rows if isinstance(r, dict)]
+        client_ids = self.intern('client', [r.get('client') for r in rows])
+        flat = []
+        for r in rows:
+            cgs = r.get('caregivers')
+            flat.extend(cgs if isinstance(cgs, list) else [r.get('caregiver')])
+        caregiver_ids = iter(self.intern('caregiver', flat))
+        uid_map = self.uid_map()
+        out = []
+        for r, client_id in zip(rows, client_ids):
+            row = dict(r, clientId=client_id)
+            client_uid = self.uid_for('client', r.get('client'), uid_map)
+            if client_uid:
+                row['clientUID'] = client_uid
+            cgs = r.get('caregivers')
+            if isinstance(cgs, list):
+                row['caregiverIds'] = [next(caregiver_ids) for _ in cgs]
+                primary = cgs[0] if cgs else None
+                if primary is not None:
+                    row.setdefault('originalCaregiver', primary)
+            else:
+                row['caregiverId'] = next(caregiver_ids)
+                primary = r.get('caregiver')
+            caregiver_uid = self.uid_for('caregiver', primary, uid_map)
+            if caregiver_uid:
+                row['caregiverUID'] = caregiver_uid
+            out.append(row)
+        return out
+
+
+def make_registry(path=None, legacy_uids_path=None):
+    """
+    Registry in CASECON_NAMES_DB, or data/names.db next to this module.
+    """
+    path = path or os.environ.get('CASECON_NAMES_DB') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'data', 'names.db')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return NameRegistry(path, legacy_uids_path)
@@ -0,0 +1,153 @@
+import codecs
+import re
+
+# Read size for streamed request bodies and uploaded files
+CHUNK_SIZE = 64 * 1024
+
+# ---------------------------------------------------------------------------
+# Input: pasted text, uploaded files and streamed request bodies
+# ---------------------------------------------------------------------------
+
+def iter_raw_lines(source):
+    """
+    Yields lines split on '\\n' (like str.split('\\n')) from a str, or from a
+    binary/text file-like object read in chunks so the whole input is never held.
+    Bytes are decoded as UTF-8, skipping a leading BOM.
+    """
+    if isinstance(source, str):
+        yield from source.split('\n')
+        return
+    decoder = None
+    pending = ''
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+            chunk = decoder.decode(chunk)
+        pieces = (pending + chunk).split('\n')
+        pending = pieces.pop()
+        yield from pieces
+    if decoder is not None:
+        pending += decoder.decode(b'', final=True)
+    yield pending
+
+# ---------------------------------------------------------------------------
+# BUCA
+# ---------------------------------------------------------------------------
+
+# Find the case number: starts with '00' + letter or digit, or 'CAS', then dash, then alphanum/dash
+# Stop at labels 'Date:' or 'ESTCaregiver:' (with optional whitespace before the label), or any whitespace/end.
+# This avoids prematurely stopping when 'Date' appears inside another word (e.g., 'Candidate').
+BUCA_CASE_NUMBER_RE = re.compile(r'((?:00[a-zA-Z0-9]|CAS)[-A-Z0-9]+?)(?=(?:\s*Date:|\s*ESTCaregiver:)|\s|$)')
+BUCA_CAREGIVERS_RE = re.compile(r'ESTCaregiver:\s*(.+)$')
+BUCA_CAREGIVER_SPLIT_RE = re.compile(r'[,/&]| and ')
+
+def parse_buca_line(line):
+    case_number_match = BUCA_CASE_NUMBER_RE.search(line)
+    if not case_number_match:
+        return {
+            'client': '',
+            'caregivers': [],
+            'caseNumber': '',
+            'is_valid': False,
+            'raw': line
+        }
+    case_number = case_number_match.group(1)
+    client = line[:case_number_match.start()].strip()
+    # Find caregivers
+    cg_match = BUCA_CAREGIVERS_RE.search(line)
+    caregivers = []
+    if cg_match:
+        caregivers = [cg.strip() for cg in BUCA_CAREGIVER_SPLIT_RE.split(cg_match.group(1)) if cg.strip()]
+    is_valid = bool(client and case_number and caregivers)
+    return {
+        'client': client,
+        'caregivers': caregivers,
+        'caseNumber': case_number,
+        'is_valid': is_valid,
+        'raw': line
+    }
+
+def iter_buca_rows(source):
+    """
+    Parsed BUCA rows, numbered from 1, one per non-empty line of source
+    (anything iter_raw_lines accepts).
+    """
+    row = 0
+    for line in iter_raw_lines(source):
+        line = line.strip()
+        if not line:
+            continue
+        row += 1
+        parsed = parse_buca_line(line)
+        parsed['row'] = row
+        yield parsed
+
+# ---------------------------------------------------------------------------
+# JOVIE
+# ---------------------------------------------------------------------------
+
+# 'MM/DD/YYYY' or 'Mon, Aug, 4th', checked once per candidate line
+JOVIE_DATE_RE = re.compile(r'^(?:\d{1,2}/\d{1,2}/\d{4}|[A-Za-z]{3},\s+[A-Za-z]{3},\s+\d{1,2}(?:st|nd|rd|th)?)$')
+
+# Parser states
+_START, _AFTER_DATE, _COLLECT, _SKIP_REST = range(4)
+
+class JovieParser:
+    """
+    Single-pass state machine over JOVIE paste lines.
+    A date on the first non-empty line is reported (a second date right after it is
+    skipped), then every 3 non-empty lines form a row (client, caregiver, time) and
+    any further lines up to the next blank line are ignored.
+    """
+
+    def __init__(self):
+        self.date = None
+        self._state = _START
+        self._block = []
+        self._rownum = 0
+
+    def feed(self, line):
+        """
+        Consume one line; returns the completed row dict, or None.
+        """
+        line = line.strip()
+        state = self._state
+        if state == _SKIP_REST:
+            if not line:
+                self._state = _COLLECT
+            return None
+        if not line:
+            return None
+        if state in (_START, _AFTER_DATE):
+            self._state = _COLLECT
+            if JOVIE_DATE_RE.match(line):
+                if state == _START:
+                    self.date = line
+                    self._state = _AFTER_DATE
+                return None
+        self._block.append(line)
+        if len(self._block) < 3:
+            return None
+        client, caregiver, time = self._block
+        self._block = []
+        self._state = _SKIP_REST
+        self._rownum += 1
+        return {
+            'row': self._rownum,
+            'client': client,
+            'caregiver': caregiver,
+            'time': time,
+        }
+
+    def rows(self, source):
+        """
+        Rows parsed lazily from source (anything iter_raw_lines accepts).
+        """
+        for line in iter_raw_lines(source):
+            row = self.feed(line)
+            if row is not None:
+                yield row
@@ -0,0 +1,104 @@
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it responses fall back to gzip/deflate
+    brotli = None
+
+# Result fields sent as small integer codes into a per-response lookup table
+ENUM_FIELDS = ('source', 'match_type', 'tag')
+RESULT_FIELDS = ('source', 'client', 'caregiver', 'match_type', 'tag', 'confidence')
+
+COLUMNAR_MIMETYPE = 'application/vnd.casecon.columnar+json'
+# Bodies smaller than this aren't worth the CPU to compress
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE_MIMETYPES = ('application/json', COLUMNAR_MIMETYPE, 'text/csv', 'text/plain', 'application/x-ndjson')
+
+
+def to_columnar(results):
+    """
+    Results as parallel arrays, one per field, instead of a list of dicts:
+    {'format': 'columnar', 'count', 'enums': {field: [values]}, 'columns': {field: [...]}}.
+    source, match_type and tag hold indexes into enums[field]; row i is
+    {f: columns[f][i]} with the enum codes looked up.
+    """
+    enums = {f: [] for f in ENUM_FIELDS}
+    codes = {f: {} for f in ENUM_FIELDS}
+    columns = {f: [] for f in RESULT_FIELDS}
+    for r in results:
+        for f in RESULT_FIELDS:
+            value = r.get(f)
+            if f in codes:
+                code = codes[f].get(value)
+                if code is None:
+                    code = codes[f][value] = len(enums[f])
+                    enums[f].append(value)
+                value = code
+            columns[f].append(value)
+    return {'format': 'columnar', 'count': len(results), 'enums': enums, 'columns': columns}
+
+
+def from_columnar(payload):
+    """
+    Inverse of to_columnar.
+    """
+    enums = payload['enums']
+    columns = payload['columns']
+    rows = []
+    for i in range(payload['count']):
+        row = {}
+        for f in RESULT_FIELDS:
+            value = columns[f][i]
+            row[f] = enums[f][value] if f in enums else value
+        rows.append(row)
+    return rows
+
+
+def wants_columnar(data, args, accept):
+    """
+    True if the request asked for the columnar format: 'format': 'columnar' in the
+    JSON body or query string, or the columnar media type in Accept.
+    """
+    fmt = (data or {}).get('format') or args.get('format')
+    return fmt == 'columnar' or accept.best == COLUMNAR_MIMETYPE
+
+
+def pick_encoding(accept_encodings):
+    """
+    Best supported content coding from a parsed Accept-Encoding, or None.
+    """
+    offered = ['gzip', 'deflate']
+    if brotli is not None:
+        offered.insert(0, 'br')
+    # best_match honours q-values; the server's order breaks ties
+    encoding = accept_encodings.best_match(offered)
+    return encoding if encoding in offered and accept_encodings[encoding] > 0 else None
+
+
+def compress_response(response, accept_encodings):
+    """
+    Compresses a buffered text/JSON response in place when the client accepts it.
+    Streamed and file responses are left alone.
+    """
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 304) or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+    encoding = pick_encoding(accept_encodings)
+    if encoding is None:
+        return response
+    if encoding == 'br':
+        body = brotli.compress(body, quality=5)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=5)
+    else:
+        body = zlib.compress(body, 5)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
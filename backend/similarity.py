@@ -0,0 +1,224 @@
+import difflib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Scores kept in memory; the least recently used are evicted first
+DEFAULT_MAX_ENTRIES = 200_000
+# On-disk scores not used for this many days are dropped
+DISK_TTL_DAYS = 90
+
+
+def lcs_length(a, b):
+    """
+    Length of the longest common subsequence of a and b, bit-parallel
+    (Allison-Dix / Hyyro): one pass over b with a few big-int operations per char.
+    """
+    if not a or not b:
+        return 0
+    masks = {}
+    for i, ch in enumerate(a):
+        masks[ch] = masks.get(ch, 0) | (1 << i)
+    full = (1 << len(a)) - 1
+    v = full
+    for ch in b:
+        u = v & masks.get(ch, 0)
+        v = (v + u) | (v - u)
+    return len(a) - bin(v & full).count('1')
+
+
+def ratio_bound(a, b):
+    """
+    Upper bound on difflib.SequenceMatcher(None, a, b).ratio(): its matching blocks
+    form a common subsequence, so they can't cover more than the LCS.
+    """
+    total = len(a) + len(b)
+    return 2.0 * lcs_length(a, b) / total if total else 1.0
+
+
+def _today():
+    return int(time.time() // 86400)
+
+
+class SimilarityCache:
+    """
+    Memo of SequenceMatcher(None, a, b).ratio() keyed on the (already normalized)
+    name pair, in a bounded in-memory LRU backed by an SQLite file so scores from
+    earlier runs are reused after a restart. path=None keeps it in memory only.
+
+    score() rules out pairs that can't reach the cutoff (length, then LCS bound)
+    before running SequenceMatcher. The LCS bound is cached too, flagged inexact:
+    it answers later lookups whose cutoff is above it. New and reused entries are
+    written to disk in batches by flush().
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._loaded = path is None
+        self._local = threading.local()
+        self._pruned_day = None
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def _conn(self):
+        # Per thread and per process (batch workers are forked with this object)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS scores ('
+                'a TEXT NOT NULL, b TEXT NOT NULL, ratio REAL NOT NULL, exact INTEGER NOT NULL, '
+                'last_used INTEGER NOT NULL, PRIMARY KEY (a, b)) WITHOUT ROWID'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _load(self):
+        # Warm the LRU with the most recently used scores on first use, not at import
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                rows = self._conn().execute(
+                    'SELECT a, b, ratio, last_used, exact FROM scores ORDER BY last_used DESC LIMIT ?',
+                    (self.max_entries,),
+                ).fetchall()
+            except sqlite3.Error as e:
+                print(f"Similarity cache unavailable, keeping scores in memory only: {e}")
+                self.path = None
+                return
+            # Oldest first, so the most recent end up at the fresh end of the LRU
+            for a, b, ratio, day, exact in reversed(rows):
+                self._entries[(a, b)] = (ratio, day, bool(exact))
+
+    def score(self, a, b, cutoff=0.0):
+        """
+        SequenceMatcher(None, a, b).ratio() if it is at least cutoff, else None.
+        """
+        if not self._loaded:
+            self._load()
+        key = (a, b)
+        today = _today()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, day, exact = entry
+                # An inexact entry is only an upper bound: it settles pairs below it
+                if exact or value < cutoff:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if day != today:
+                        # Refresh last_used on disk so daily names aren't aged out
+                        self._entries[key] = (value, today, exact)
+                        self._pending[key] = (value, exact)
+                    return value if value >= cutoff else None
+        total = len(a) + len(b)
+        if total and 2.0 * min(len(a), len(b)) / total < cutoff:
+            # Cheaper to recompute than to cache
+            with self._lock:
+                self.skipped += 1
+            return None
+        value = ratio_bound(a, b)
+        exact = value >= cutoff
+        if exact:
+            value = difflib.SequenceMatcher(None, a, b).ratio()
+        with self._lock:
+            if exact:
+                self.misses += 1
+            else:
+                self.skipped += 1
+            self._entries[key] = (value, today, exact)
+            self._pending[key] = (value, exact)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value if value >= cutoff else None
+
+    def flush(self):
+        """
+        Write new and reused scores to disk. Cheap when nothing changed.
+        """
+        with self._lock:
+            if self.path is None:
+                self._pending.clear()
+                return
+            if not self._pending:
+                return
+            pending = self._pending
+            self._pending = {}
+        today = _today()
+        try:
+            conn = self._conn()
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO scores (a, b, ratio, exact, last_used) VALUES (?, ?, ?, ?, ?)',
+                    [(a, b, ratio, int(exact), today) for (a, b), (ratio, exact) in pending.items()],
+                )
+                if self._pruned_day != today:
+                    conn.execute('DELETE FROM scores WHERE last_used < ?', (today - DISK_TTL_DAYS,))
+                    self._pruned_day = today
+        except sqlite3.Error as e:
+            print(f"Failed to persist similarity scores: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'skipped': self.skipped,
+                'persistent': self.path is not None,
+            }
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """
+    Process-wide cache: CASECON_SIMILARITY_DB (default data/similarity.db next to
+    this module, 'off' for memory only), CASECON_SIMILARITY_CACHE_SIZE entries in memory.
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            path = os.environ.get('CASECON_SIMILARITY_DB') or os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), 'data', 'similarity.db')
+            if path == 'off':
+                path = None
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            size = int(os.environ.get('CASECON_SIMILARITY_CACHE_SIZE', DEFAULT_MAX_ENTRIES))
+            _default = SimilarityCache(path, size)
+        return _default
+
+
+def set_default_cache(cache):
+    global _default
+    with _default_lock:
+        _default = cache
+
+
+def similarity(a, b, cutoff=0.0):
+    """
+    Cached SequenceMatcher(None, a, b).ratio(), or None if below cutoff.
+    """
+    return default_cache().score(a, b, cutoff)
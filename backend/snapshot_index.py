@@ -0,0 +1,146 @@
+import base64
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+INDEX_NAME = '.index.json'
+SORT_FIELDS = ('createdAt', 'name', 'sizeBytes')
+
+
+def _encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    try:
+        return tuple(json.loads(base64.urlsafe_b64decode(cursor.encode('ascii'))))
+    except (ValueError, TypeError):
+        raise ValueError('invalid cursor')
+
+
+class SnapshotIndex:
+    """
+    Listing metadata for every snapshot file, kept in a sidecar file in the snapshot
+    directory so listing never has to parse the snapshots themselves.
+
+    Entries are keyed by file name and remember the file's mtime/size; each listing
+    stats the directory and re-reads only files that are new or changed, so the
+    index repairs itself after edits by other workers or by hand.
+    """
+
+    def __init__(self, snap_dir, load_snapshot, is_snapshot_file, snapshot_id_from_file=None):
+        self.snap_dir = snap_dir
+        self.path = os.path.join(snap_dir, INDEX_NAME)
+        self.load_snapshot = load_snapshot
+        self.is_snapshot_file = is_snapshot_file
+        self.snapshot_id_from_file = snapshot_id_from_file or (lambda name: os.path.splitext(name)[0])
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def entries(self):
+        with self._lock:
+            self._refresh()
+            return [dict(e['meta']) for e in self._entries.values() if e.get('meta')]
+
+    def upsert(self, file_name, snap):
+        """
+        Record a snapshot that was just written (snap is its decoded content).
+        """
+        with self._lock:
+            self._ensure_loaded()
+            self._entries[file_name] = self._entry(file_name, snap)
+            self._save()
+
+    def remove(self, file_name):
+        with self._lock:
+            self._ensure_loaded()
+            if self._entries.pop(file_name, None) is not None:
+                self._save()
+
+    def page(self, sort='createdAt', order='desc', limit=None, cursor=None):
+        """
+        Sorted metadata, optionally limited to one page after an opaque cursor.
+        Returns (items, next_cursor); next_cursor is None on the last page.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+        descending = order != 'asc'
+
+        def sort_key(meta):
+            value = meta.get(sort)
+            value = (value or 0) if sort == 'sizeBytes' else str(value or '')
+            return (value, str(meta.get('id')))
+
+        items = sorted(self.entries(), key=sort_key, reverse=descending)
+        if cursor:
+            after = _decode_cursor(cursor)
+            if len(after) != 2 or isinstance(after[0], str) == (sort == 'sizeBytes'):
+                raise ValueError('invalid cursor')
+            items = [m for m in items if (sort_key(m) < after if descending else sort_key(m) > after)]
+        if limit is None or len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        return items, _encode_cursor(sort_key(items[-1]))
+
+    def _entry(self, file_name, snap):
+        stat = os.stat(os.path.join(self.snap_dir, file_name))
+        stem = self.snapshot_id_from_file(file_name)
+        created = snap.get('createdAt') or datetime.fromtimestamp(stat.st_mtime, timezone.utc).replace(tzinfo=None).isoformat()
+        return {
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'meta': {
+                'id': snap.get('id') or stem,
+                'name': snap.get('name') or stem,
+                'createdAt': created,
+                'createdBy': snap.get('createdBy') or 'unknown',
+                'appVersion': snap.get('appVersion'),
+                'schemaVersion': snap.get('schemaVersion'),
+                'sizeBytes': stat.st_size,
+            },
+        }
+
+    def _ensure_loaded(self):
+        if self._entries is not None:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f).get('entries', {})
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            # Missing or unreadable sidecar, rebuilt by the next _refresh
+            self._entries = {}
+
+    def _refresh(self):
+        self._ensure_loaded()
+        changed = False
+        seen = set()
+        try:
+            scan = list(os.scandir(self.snap_dir))
+        except FileNotFoundError:
+            scan = []
+        for de in scan:
+            if not self.is_snapshot_file(de.name):
+                continue
+            seen.add(de.name)
+            stat = de.stat()
+            known = self._entries.get(de.name)
+            if known and known.get('mtime') == stat.st_mtime_ns and known.get('size') == stat.st_size:
+                continue
+            try:
+                self._entries[de.name] = self._entry(de.name, self.load_snapshot(de.path))
+            except Exception:
+                # ignore bad file, but remember it so it isn't re-read until it changes
+                self._entries[de.name] = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'meta': None}
+            changed = True
+        for name in set(self._entries) - seen:
+            del self._entries[name]
+            changed = True
+        if changed:
+            self._save()
+
+    def _save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self._entries}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
@@ -0,0 +1,196 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+# Lists whose JSON is at least this big are stored once as shared blobs
+BLOB_MIN_BYTES = 1024
+BLOB_DIR = 'blobs'
+# Unreferenced blobs younger than this survive pruning
+BLOB_GRACE_SECONDS = 300
+LEGACY_EXT = '.json'
+COMPACT_EXT = '.json.gz'
+# Snapshot ids become file names, so only plain tokens (uuids and the like) are accepted
+SNAPSHOT_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+BLOB_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+# User keys that look like the blob marker ($blob, $$blob...) are stored with one more '$'
+ESCAPED_KEY_RE = re.compile(r'^\$+blob$')
+
+
+class InvalidSnapshotId(ValueError):
+    pass
+
+
+def check_snapshot_id(snap_id):
+    """
+    snap_id as a str; InvalidSnapshotId unless it is 1-128 letters, digits, _ or -.
+    """
+    snap_id = str(snap_id)
+    if not SNAPSHOT_ID_RE.match(snap_id):
+        raise InvalidSnapshotId('Snapshot ids are 1-128 letters, digits, _ or -')
+    return snap_id
+
+
+def is_snapshot_file(name):
+    return not name.startswith('.') and (name.endswith(LEGACY_EXT) or name.endswith(COMPACT_EXT))
+
+
+def snapshot_id_from_file(name):
+    for ext in (COMPACT_EXT, LEGACY_EXT):
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return name
+
+
+def snapshot_path(snap_dir, snap_id):
+    """
+    Path of the stored snapshot, compact format first, or None if it doesn't exist.
+    """
+    snap_id = check_snapshot_id(snap_id)
+    for ext in (COMPACT_EXT, LEGACY_EXT):
+        p = os.path.join(snap_dir, f"{snap_id}{ext}")
+        if os.path.exists(p):
+            return p
+    return None
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _write_atomic(path, data):
+    # Unique temp name so concurrent writers of the same blob don't clobber each other
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _blob_path(snap_dir, digest):
+    return os.path.join(snap_dir, BLOB_DIR, digest[:2], f"{digest}{COMPACT_EXT}")
+
+
+def _externalize(snap_dir, value):
+    """
+    Replace large lists (rows, results, corrections...) by {'$blob': digest}
+    references, writing each distinct list once under blobs/. Dicts are walked,
+    lists are stored whole, so blobs never reference other blobs. User keys that
+    could be mistaken for a reference get an extra '$', see _unescape_key.
+    """
+    if isinstance(value, dict):
+        return {_escape_key(k): _externalize(snap_dir, v) for k, v in value.items()}
+    if not isinstance(value, list):
+        return value
+    raw = _dumps(value)
+    if len(raw) < BLOB_MIN_BYTES:
+        return value
+    digest = hashlib.sha256(raw).hexdigest()
+    path = _blob_path(snap_dir, digest)
+    if os.path.exists(path):
+        # Refresh mtime so a concurrent prune_blobs leaves it alone
+        os.utime(path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, gzip.compress(raw, compresslevel=6))
+    return {'$blob': digest}
+
+
+def _escape_key(key):
+    return f"${key}" if isinstance(key, str) and ESCAPED_KEY_RE.match(key) else key
+
+
+def _unescape_key(key):
+    return key[1:] if key.startswith('$$') and ESCAPED_KEY_RE.match(key) else key
+
+
+def _is_ref(value):
+    if not (isinstance(value, dict) and len(value) == 1):
+        return False
+    digest = value.get('$blob')
+    return isinstance(digest, str) and BLOB_DIGEST_RE.match(digest) is not None
+
+
+def _internalize(snap_dir, value):
+    if _is_ref(value):
+        with open(_blob_path(snap_dir, value['$blob']), 'rb') as f:
+            return json.loads(gzip.decompress(f.read()))
+    if isinstance(value, dict):
+        return {_unescape_key(k): _internalize(snap_dir, v) for k, v in value.items()}
+    return value
+
+
+def _refs(value, out):
+    if _is_ref(value):
+        out.add(value['$blob'])
+    elif isinstance(value, dict):
+        for v in value.values():
+            _refs(v, out)
+    return out
+
+
+def write_snapshot(snap_dir, snap_id, snap):
+    """
+    Store a snapshot as a gzip manifest with its large blocks deduplicated.
+    Any older plain .json copy of the same id is removed. Returns the file name.
+    """
+    snap_id = check_snapshot_id(snap_id)
+    name = f"{snap_id}{COMPACT_EXT}"
+    manifest = _externalize(snap_dir, snap) if isinstance(snap, dict) else snap
+    _write_atomic(os.path.join(snap_dir, name), gzip.compress(_dumps(manifest), compresslevel=6))
+    legacy = os.path.join(snap_dir, f"{snap_id}{LEGACY_EXT}")
+    if os.path.exists(legacy):
+        os.remove(legacy)
+    return name
+
+
+def read_manifest(path):
+    """
+    Snapshot top-level content without resolving blobs; enough for listing metadata.
+    Plain .json snapshots are returned as-is.
+    """
+    if path.endswith(COMPACT_EXT):
+        with open(path, 'rb') as f:
+            return json.loads(gzip.decompress(f.read()))
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_snapshot(path):
+    manifest = read_manifest(path)
+    if not path.endswith(COMPACT_EXT):
+        return manifest
+    return _internalize(os.path.dirname(path), manifest)
+
+
+def delete_snapshot(snap_dir, path):
+    os.remove(path)
+    prune_blobs(snap_dir)
+
+
+def prune_blobs(snap_dir):
+    """
+    Remove blobs no longer referenced by any snapshot manifest.
+    Manifests are small once their blocks are externalized, so this is a cheap scan.
+    Recently written blobs are kept in case their manifest is still being saved.
+    """
+    cutoff = time.time() - BLOB_GRACE_SECONDS
+    referenced = set()
+    for name in os.listdir(snap_dir):
+        if name.endswith(COMPACT_EXT) and not name.startswith('.'):
+            try:
+                _refs(read_manifest(os.path.join(snap_dir, name)), referenced)
+            except Exception:
+                # Unreadable manifest: keep every blob rather than risk losing its data
+                return
+    blob_root = os.path.join(snap_dir, BLOB_DIR)
+    if not os.path.isdir(blob_root):
+        return
+    for prefix in os.listdir(blob_root):
+        folder = os.path.join(blob_root, prefix)
+        for name in os.listdir(folder):
+            p = os.path.join(folder, name)
+            if snapshot_id_from_file(name) not in referenced and os.path.getmtime(p) < cutoff:
+                os.remove(p)
@@ -0,0 +1,178 @@
+import os
+import pickle
+import sqlite3
+import threading
+
+
+class MemoryState(dict):
+    """
+    Process-local state, the original behaviour. Fine for a single worker.
+    """
+
+    backend = 'memory'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._modify_lock = threading.Lock()
+
+    def modify(self, key, fn):
+        """
+        Stores fn(current value or None) under key atomically and returns it.
+        """
+        with self._modify_lock:
+            value = fn(dict.get(self, key))
+            self[key] = value
+            return value
+
+    def forget(self, key):
+        # Nothing is cached apart from the values themselves
+        pass
+
+
+class SQLiteState:
+    """
+    State shared by every worker through a SQLite database in WAL mode, so readers
+    never block the writer. Each key carries a version bumped on every write; values
+    are unpickled once per version and then served from an in-process read cache,
+    so a read is a single indexed version lookup unless another worker changed it.
+
+    local_keys stay process-local (e.g. compiled indexes each worker derives itself).
+    Values are replaced wholesale: mutate a copy and assign it back, or use modify()
+    when several workers may change the same key at once.
+    """
+
+    backend = 'sqlite'
+
+    def __init__(self, path, local_keys=()):
+        self.path = path
+        self.local_keys = set(local_keys)
+        self._local = {}
+        self._cache = {}
+        self._conns = threading.local()
+        with self._conn() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS state ('
+                'key TEXT PRIMARY KEY, version INTEGER NOT NULL, value BLOB)'
+            )
+
+    def _conn(self):
+        conn = getattr(self._conns, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._conns.conn = conn
+        return conn
+
+    def __contains__(self, key):
+        if key in self.local_keys:
+            return key in self._local
+        return self._conn().execute('SELECT 1 FROM state WHERE key = ?', (key,)).fetchone() is not None
+
+    def __getitem__(self, key):
+        if key in self.local_keys:
+            return self._local.get(key)
+        conn = self._conn()
+        row = conn.execute('SELECT version FROM state WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            # Removed by another worker: drop our unpickled copy too
+            self._cache.pop(key, None)
+            return None
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == row[0]:
+            return cached[1]
+        row = conn.execute('SELECT version, value FROM state WHERE key = ?', (key,)).fetchone()
+        value = pickle.loads(row[1])
+        self._cache[key] = (row[0], value)
+        return value
+
+    def get(self, key, default=None):
+        value = self[key]
+        return default if value is None else value
+
+    def __setitem__(self, key, value):
+        if key in self.local_keys:
+            self._local[key] = value
+            return
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT INTO state (key, version, value) VALUES (?, 1, ?) '
+                'ON CONFLICT(key) DO UPDATE SET version = version + 1, value = excluded.value',
+                (key, blob),
+            )
+            version = conn.execute('SELECT version FROM state WHERE key = ?', (key,)).fetchone()[0]
+        self._cache[key] = (version, value)
+
+    def modify(self, key, fn):
+        """
+        Stores fn(current value or None) under key and returns it, as one write
+        transaction: concurrent modify() calls from any worker apply in turn instead
+        of overwriting each other. fn must not use the store itself.
+        """
+        if key in self.local_keys:
+            value = fn(self._local.get(key))
+            self._local[key] = value
+            return value
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT version, value FROM state WHERE key = ?', (key,)).fetchone()
+            cached = self._cache.get(key)
+            if row is None:
+                current = None
+            elif cached is not None and cached[0] == row[0]:
+                current = cached[1]
+            else:
+                current = pickle.loads(row[1])
+            value = fn(current)
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            conn.execute(
+                'INSERT INTO state (key, version, value) VALUES (?, 1, ?) '
+                'ON CONFLICT(key) DO UPDATE SET version = version + 1, value = excluded.value',
+                (key, blob),
+            )
+            version = conn.execute('SELECT version FROM state WHERE key = ?', (key,)).fetchone()[0]
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        self._cache[key] = (version, value)
+        return value
+
+    def forget(self, key):
+        """
+        Drops this process's unpickled copy of key; the stored value is kept.
+        """
+        self._cache.pop(key, None)
+
+    def pop(self, key, default=None):
+        if key in self.local_keys:
+            return self._local.pop(key, default)
+        value = self[key]
+        with self._conn() as conn:
+            conn.execute('DELETE FROM state WHERE key = ?', (key,))
+        self._cache.pop(key, None)
+        return default if value is None else value
+
+    def setdefault(self, key, default=None):
+        # Workers starting up must not wipe state another worker already wrote
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+
+def make_state(backend=None, path=None, local_keys=()):
+    """
+    State store selected by CASECON_STATE_BACKEND ('memory' or 'sqlite');
+    the SQLite file defaults to CASECON_STATE_DB or data/state.db next to this module.
+    """
+    backend = backend or os.environ.get('CASECON_STATE_BACKEND', 'memory')
+    if backend == 'memory':
+        return MemoryState()
+    if backend == 'sqlite':
+        path = path or os.environ.get('CASECON_STATE_DB') or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'data', 'state.db')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return SQLiteState(path, local_keys)
+    raise ValueError(f"Unknown state backend '{backend}'")
@@ -0,0 +1,34 @@
+import time
+
+
+class PhaseTimer:
+    """
+    Splits wall time into named phases: mark(name) ends the phase that began at the
+    previous mark (or at construction) and adds its duration to phases[name].
+    Long phases also call progress(phase, done, total) as they go; it is a no-op
+    here and exists for subclasses (e.g. compare jobs reporting progress).
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._last = time.perf_counter()
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0.0) + (now - self._last)
+        self._last = now
+
+    def progress(self, phase, done, total):
+        pass
+
+
+class _NullTimer:
+    # Stand-in when nobody is timing, so the compare code can mark unconditionally
+    def mark(self, name):
+        pass
+
+    def progress(self, phase, done, total):
+        pass
+
+
+NULL_TIMER = _NullTimer()
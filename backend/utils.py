@@ -1,49 +1,173 @@
-import pandas as pd
+class CorrectionsIndex:
+    """
+    Corrections compiled once into normalized lookup dicts, one per type.
+    version identifies the corrections list it was compiled from; app.py bumps it
+    whenever corrections change so callers can tell a stale index (or cached result).
+    """
+
+    def __init__(self, corrections=None, version=0):
+        self.version = version
+        self.mappings = {'client': {}, 'caregiver': {}}
+        for c in corrections or []:
+            mapping = self.mappings.get(c.get('type'))
+            buca, jovie = c.get('buca'), c.get('jovie')
+            # Entries from older files or clients may hold non-string names; skip them
+            if mapping is not None and buca and jovie and isinstance(buca, str) and isinstance(jovie, str):
+                mapping[buca.strip().lower()] = jovie
+
+    def __len__(self):
+        return sum(len(m) for m in self.mappings.values())
+
+    def mapping_for(self, col):
+        return self.mappings['client' if col.lower() == 'client' else 'caregiver']
+
+def compile_corrections(corrections, version=0):
+    """
+    Returns corrections as a CorrectionsIndex, compiling a plain list if needed.
+    """
+    if isinstance(corrections, CorrectionsIndex):
+        return corrections
+    return CorrectionsIndex(corrections, version)
 
 def apply_corrections(df, corrections, col):
     """
     Applies universal name corrections to a DataFrame column, case-insensitive.
     df: pandas DataFrame
-    corrections: list of {type, buca, jovie}
+    corrections: CorrectionsIndex, or list of {type, buca, jovie}
     col: column name to apply corrections to ('Client' or 'Caregiver')
     """
     if not corrections or col not in df.columns:
         return df
-    # Determine which corrections to use based on type
-    corr_type = 'client' if col.lower() == 'client' else 'caregiver'
-    mapping = {c['buca'].strip().lower(): c['jovie'] for c in corrections if c.get('type') == corr_type and c.get('buca') and c.get('jovie')}
-    def correct_val(val):
-        if isinstance(val, str) and val.strip().lower() in mapping:
-            return mapping[val.strip().lower()]
-        return val
-    df[col] = df[col].apply(correct_val)
+    mapping = compile_corrections(corrections).mapping_for(col)
+    if not mapping:
+        return df
+    try:
+        keys = df[col].str.strip().str.lower()
+    except AttributeError:
+        # No string values in this column, nothing to correct
+        return df
+    corrected = keys.map(mapping)
+    df[col] = corrected.where(corrected.notna(), df[col])
     return df
 
-import difflib
+def frames_from_rows(buca_rows, jovie_rows):
+    """
+    Builds the Client/Caregiver frames compare_buca_jovie expects from /compare JSON rows
+    (BUCA: client + caregivers list or caregiver; JOVIE: client + caregiver).
+    Raises ValueError if either side is missing those columns.
+    """
+    import pandas as pd
+    # Ensure DataFrame type
+    buca_df = pd.DataFrame(buca_rows) if isinstance(buca_rows, list) else buca_rows
+    jovie_df = pd.DataFrame(jovie_rows) if isinstance(jovie_rows, list) else jovie_rows
+    # Standardize columns for compare_buca_jovie
+    if 'client' in buca_df.columns and 'caregivers' in buca_df.columns:
+        buca_df = buca_df.rename(columns={'client': 'Client', 'caregivers': 'Caregiver'})
+    elif 'client' in buca_df.columns and 'caregiver' in buca_df.columns:
+        buca_df = buca_df.rename(columns={'client': 'Client', 'caregiver': 'Caregiver'})
+    else:
+        raise ValueError('BUCA data must have client and caregiver(s) columns')
+    if 'client' in jovie_df.columns and 'caregiver' in jovie_df.columns:
+        jovie_df = jovie_df.rename(columns={'client': 'Client', 'caregiver': 'Caregiver'})
+    else:
+        raise ValueError('JOVIE data must have client and caregiver columns')
+    # Flatten any list values in 'Caregiver' columns to comma-separated strings
+    for df in (buca_df, jovie_df):
+        df['Caregiver'] = df['Caregiver'].apply(_flatten_caregiver)
+    return buca_df, jovie_df
+
+def _flatten_caregiver(x):
+    return ', '.join(x) if isinstance(x, list) else (x if x is not None else '')
+
+class RowRecord:
+    """
+    One BUCA or JOVIE row as the compare engines see it (several BUCA caregivers
+    joined with ', '). Slots keep big rosters small without building a DataFrame.
+    """
+
+    __slots__ = ('client', 'caregiver')
+
+    def __init__(self, client, caregiver):
+        self.client = client
+        self.caregiver = caregiver
 
-def compare_buca_jovie(buca_df, jovie_df, corrections):
+def _caregiver_field(rows, plural_ok):
+    keys = set()
+    for r in rows:
+        if isinstance(r, dict):
+            keys.update(r)
+    if 'client' not in keys:
+        return None
+    if plural_ok and 'caregivers' in keys:
+        return 'caregivers'
+    return 'caregiver' if 'caregiver' in keys else None
+
+def records_from_rows(buca_rows, jovie_rows):
+    """
+    Same input and errors as frames_from_rows, as RowRecord lists instead of DataFrames.
+    """
+    buca_field = _caregiver_field(buca_rows, True)
+    if buca_field is None:
+        raise ValueError('BUCA data must have client and caregiver(s) columns')
+    jovie_field = _caregiver_field(jovie_rows, False)
+    if jovie_field is None:
+        raise ValueError('JOVIE data must have client and caregiver columns')
+    if not all(isinstance(r, dict) for r in buca_rows) or not all(isinstance(r, dict) for r in jovie_rows):
+        raise ValueError('BUCA and JOVIE rows must be objects')
+    # A key missing from a row reads as NaN, as it does in the frames_from_rows frame
+    missing = float('nan')
+    buca = [RowRecord(r.get('client', missing), _flatten_caregiver(r.get(buca_field, missing))) for r in buca_rows]
+    jovie = [RowRecord(r.get('client', missing), _flatten_caregiver(r.get(jovie_field, missing))) for r in jovie_rows]
+    return buca, jovie
+
+def records_from_frame(df):
+    """
+    RowRecords of a standardized frame. Without a Client column there is nothing to
+    match (compare_buca_jovie skips the side too); a missing Caregiver column reads as NaN.
+    """
+    if 'Client' not in df.columns:
+        return []
+    clients = df['Client'].tolist()
+    caregivers = df['Caregiver'].tolist() if 'Caregiver' in df.columns else [float('nan')] * len(clients)
+    return [RowRecord(c, cg) for c, cg in zip(clients, caregivers)]
+
+from fuzzy_index import FuzzyIndex
+from similarity import similarity
+from caregiver_index import CaregiverIndex, listed_caregiver
+from timing import NULL_TIMER
+
+def compare_buca_jovie(buca_df, jovie_df, corrections, timer=None):
     """
     Compares BUCA and JOVIE dataframes after applying corrections.
     Returns a list of dicts, each with: source, client, caregiver, match_type, tag, confidence.
+    timer: optional timing.PhaseTimer, marked at the end of each phase.
     """
+    timer = timer or NULL_TIMER
     # For this logic, expect columns: Client, Caregiver (BUCA); Client, Caregiver (JOVIE)
     # Apply corrections to both Caregiver and Client columns, case-insensitive
     buca = buca_df.copy()
     jovie = jovie_df.copy()
+    corrections = compile_corrections(corrections)
     buca = apply_corrections(buca, corrections, 'Caregiver')
     buca = apply_corrections(buca, corrections, 'Client')
     jovie = apply_corrections(jovie, corrections, 'Caregiver')
     jovie = apply_corrections(jovie, corrections, 'Client')
+    timer.mark('corrections')
     # Build lowercased client and caregiver sets and mappings for case-insensitive matching
     buca_client_map = {str(c).strip().lower(): c for c in buca['Client']} if 'Client' in buca.columns else {}
     jovie_client_map = {str(c).strip().lower(): c for c in jovie['Client']} if 'Client' in jovie.columns else {}
     buca_caregiver_map = {str(c).strip().lower(): c for c in buca['Caregiver']} if 'Caregiver' in buca.columns else {}
     jovie_caregiver_map = {str(c).strip().lower(): c for c in jovie['Caregiver']} if 'Caregiver' in jovie.columns else {}
+    # Individual BUCA caregivers -> clients, for rows listing several caregivers
+    caregiver_index = _caregiver_index(buca) if {'Client', 'Caregiver'} <= set(buca.columns) else CaregiverIndex()
     buca_clients = set(buca_client_map.keys())
     jovie_clients = set(jovie_client_map.keys())
+    timer.mark('maps')
     results = []
     # Exact matches (Green)
-    for client_lc in buca_clients & jovie_clients:
+    both = buca_clients & jovie_clients
+    for done, client_lc in enumerate(both):
+        timer.progress('exact', done, len(both))
         buca_client = buca_client_map[client_lc]
         jovie_client = jovie_client_map[client_lc]
         buca_cg = str(buca[buca['Client'] == buca_client]['Caregiver'].iloc[0])
@@ -59,6 +183,18 @@ def compare_buca_jovie(buca_df, jovie_df, corrections):
                 'confidence': 1.0
             })
         elif (',' in buca_cg or '/' in buca_cg or '&' in buca_cg):
+            listed = listed_caregiver(buca_cg, jovie_cg.strip().lower())
+            if listed is not None:
+                # The JOVIE caregiver is one of the listed ones (Green)
+                results.append({
+                    'source': 'BOTH',
+                    'client': buca_client,
+                    'caregiver': listed,
+                    'match_type': 'Exact Match',
+                    'tag': 'exact_match',
+                    'confidence': 1.0
+                })
+                continue
             # Multiple caregivers unresolved (Blue)
             results.append({
                 'source': 'BUCA',
@@ -70,8 +206,7 @@ def compare_buca_jovie(buca_df, jovie_df, corrections):
             })
         else:
             # Fuzzy caregiver match (Purple)
-            similarity = difflib.SequenceMatcher(None, buca_cg.lower(), jovie_cg.lower()).ratio()
-            if similarity >= 0.6:
+            if similarity(buca_cg.lower(), jovie_cg.lower(), 0.6) is not None:
                 results.append({
                     'source': 'BUCA',
                     'client': buca_client,
@@ -106,12 +241,20 @@ def compare_buca_jovie(buca_df, jovie_df, corrections):
                     'tag': 'diff_caregiver_mismatch',
                     'confidence': 0.7
                 })
+    timer.mark('exact')
     # Fuzzy client matches (Purple)
     fuzzy_threshold = 0.6
     unmatched_buca = buca_clients - jovie_clients
     unmatched_jovie = jovie_clients - buca_clients
-    for client_lc in unmatched_buca:
-        matches = difflib.get_close_matches(client_lc, list(unmatched_jovie), n=1, cutoff=fuzzy_threshold)
+    # Candidate index over unmatched JOVIE clients instead of scoring all of them per BUCA client
+    jovie_index = FuzzyIndex(unmatched_jovie)
+    # Position of each BUCA client's 'Missing in JOVIE' row, for the orphan pass below
+    missing_in_jovie = {}
+    # Sorted so two BUCA clients contesting one JOVIE client resolve the same way every run
+    for done, client_lc in enumerate(sorted(unmatched_buca)):
+        timer.progress('fuzzy', done, len(unmatched_buca))
+        best = jovie_index.best_match(client_lc, cutoff=fuzzy_threshold)
+        matches = [best] if best is not None else []
         buca_client = buca_client_map[client_lc]
         buca_cg = str(buca[buca['Client'] == buca_client]['Caregiver'].iloc[0])
         buca_cg_lc = buca_cg.strip().lower()
@@ -119,8 +262,8 @@ def compare_buca_jovie(buca_df, jovie_df, corrections):
             jovie_client = jovie_client_map[matches[0]]
             jovie_cg = str(jovie[jovie['Client'] == jovie_client]['Caregiver'].iloc[0])
             jovie_cg_lc = jovie_cg.strip().lower()
-            if buca_cg_lc == jovie_cg_lc:
-                # If caregivers match (case-insensitive), treat as temporary mismatch
+            if buca_cg_lc == jovie_cg_lc or listed_caregiver(buca_cg, jovie_cg_lc) is not None:
+                # If caregivers match (case-insensitive, or one of several listed), treat as temporary mismatch
                 results.append({
                     'source': 'BUCA',
                     'client': buca_client,
@@ -138,8 +281,10 @@ def compare_buca_jovie(buca_df, jovie_df, corrections):
                     'confidence': 0.7
                 })
                 unmatched_jovie.remove(matches[0])
+                jovie_index.remove(matches[0])
             else:
                 # Caregivers don't match, treat as complete mismatch for both
+                missing_in_jovie[client_lc] = len(results)
                 results.append({
                     'source': 'Missing in JOVIE',
                     'client': buca_client,
@@ -149,6 +294,7 @@ def compare_buca_jovie(buca_df, jovie_df, corrections):
                     'confidence': 0.0
                 })
         else:
+            missing_in_jovie[client_lc] = len(results)
             results.append({
                 'source': 'Missing in JOVIE',
                 'client': buca_client,
@@ -157,21 +303,17 @@ def compare_buca_jovie(buca_df, jovie_df, corrections):
                 'tag': 'complete_mismatch',
                 'confidence': 0.0
             })
-    for client_lc in unmatched_jovie:
+    timer.mark('fuzzy')
+    # Sorted: when two JOVIE rows fall back to the same BUCA client, the first claims it
+    for client_lc in sorted(unmatched_jovie):
         jovie_client = jovie_client_map[client_lc]
         jovie_cg = str(jovie[jovie['Client'] == jovie_client]['Caregiver'].iloc[0])
         jovie_cg_lc = jovie_cg.strip().lower()
-        # Try to find a matching caregiver in BUCA (case-insensitive)
-        if jovie_cg_lc in buca_caregiver_map:
+        # Try to find a matching caregiver in BUCA (case-insensitive, whole field or listed)
+        orphan = _orphan_match(jovie_cg_lc, buca_caregiver_map, caregiver_index)
+        if orphan is not None:
             # If found, treat as temporary mismatch
-            results.append({
-                'source': 'BUCA',
-                'client': '',  # No matching client
-                'caregiver': buca_caregiver_map[jovie_cg_lc],
-                'match_type': 'Temporary Mismatch',
-                'tag': 'temp_mismatch',
-                'confidence': 0.7
-            })
+            _orphan_buca_row(orphan, missing_in_jovie, results)
             results.append({
                 'source': 'JOVIE',
                 'client': jovie_client,
@@ -189,5 +331,356 @@ def compare_buca_jovie(buca_df, jovie_df, corrections):
                 'tag': 'complete_mismatch',
                 'confidence': 0.0
             })
+    timer.mark('orphans')
     return results
 
+
+def _client_keys(df):
+    """
+    One row per normalized client key, mirroring the lookups compare_buca_jovie does:
+    the reported spelling is the last one seen for the key, and its caregiver is the
+    one on the first row carrying that exact spelling.
+    """
+    import pandas as pd
+    keys = pd.DataFrame({
+        'client': df['Client'],
+        'client_lc': df['Client'].map(str).str.strip().str.lower(),
+        'caregiver': df['Caregiver'].map(str),
+    })
+    first_cg = keys.drop_duplicates('client', keep='first').set_index('client')['caregiver']
+    spelling = keys.drop_duplicates('client_lc', keep='last')[['client_lc', 'client']].copy()
+    spelling['caregiver'] = spelling['client'].map(first_cg)
+    spelling['caregiver_lc'] = spelling['caregiver'].str.strip().str.lower()
+    return spelling.reset_index(drop=True)
+
+def _result(source, client, caregiver, match_type, tag, confidence):
+    return {
+        'source': source,
+        'client': client,
+        'caregiver': caregiver,
+        'match_type': match_type,
+        'tag': tag,
+        'confidence': confidence
+    }
+
+def _corrected_frames(buca_df, jovie_df, corrections):
+    corrections = compile_corrections(corrections)
+    buca = apply_corrections(buca_df.copy(), corrections, 'Caregiver')
+    buca = apply_corrections(buca, corrections, 'Client')
+    jovie = apply_corrections(jovie_df.copy(), corrections, 'Caregiver')
+    jovie = apply_corrections(jovie, corrections, 'Client')
+    return buca, jovie
+
+def _caregiver_map(buca):
+    return dict(zip(buca['Caregiver'].map(str).str.strip().str.lower(), buca['Caregiver']))
+
+def _keyed_rows(keys):
+    """
+    client_lc -> (client, caregiver, caregiver_lc) from a _client_keys frame.
+    """
+    return dict(zip(keys['client_lc'], zip(keys['client'], keys['caregiver'], keys['caregiver_lc'])))
+
+def _caregiver_index(buca):
+    return CaregiverIndex(zip(buca['Client'].map(str).str.strip().str.lower(), buca['Client'], buca['Caregiver']))
+
+def _orphan_match(cg_lc, caregiver_map, caregiver_index):
+    """
+    (client_lc, client, BUCA caregiver) for the caregiver of a JOVIE row whose client
+    BUCA lacks, or None. The whole BUCA caregiver field is tried first, then the
+    individually listed caregivers; client_lc/client are those of the only BUCA client
+    listing them, else None/''.
+    """
+    caregiver = caregiver_map[cg_lc] if cg_lc in caregiver_map else caregiver_index.spelling(cg_lc)
+    if caregiver is None:
+        return None
+    clients = caregiver_index.clients(cg_lc)
+    if len(clients) != 1:
+        return None, '', caregiver
+    client_lc, client = next(iter(clients.items()))
+    return client_lc, client, caregiver
+
+def _orphan_buca_row(orphan, missing_in_jovie, results):
+    """
+    Adds the BUCA half of an orphan JOVIE row's temp_mismatch pair. It names the BUCA
+    client only if that client is still 'Missing in JOVIE' (missing_in_jovie: client_lc
+    -> position of that row in results), and then takes that row's place; a client
+    that already has a match keeps it and the row names no client.
+    """
+    client_lc, client, caregiver = orphan
+    at = missing_in_jovie.pop(client_lc, None) if client_lc is not None else None
+    row = _result('BUCA', client if at is not None else '', caregiver, 'Temporary Mismatch', 'temp_mismatch', 0.7)
+    if at is None:
+        results.append(row)
+    else:
+        results[at] = row
+
+def _exact_results(client, buca_cg, jovie_cg, same, multi):
+    """
+    Result rows for a client present on both sides.
+    """
+    if same:
+        return [_result('BOTH', client, buca_cg, 'Exact Match', 'exact_match', 1.0)]
+    if multi:
+        listed = listed_caregiver(buca_cg, jovie_cg.strip().lower())
+        if listed is not None:
+            return [_result('BOTH', client, listed, 'Exact Match', 'exact_match', 1.0)]
+        return [_result('BUCA', client, buca_cg, 'Verify Which CG', 'verify_cg', 0.7)]
+    if similarity(buca_cg.lower(), jovie_cg.lower(), 0.6) is not None:
+        return [
+            _result('BUCA', client, buca_cg, 'Temporary Mismatch', 'temp_mismatch', 0.7),
+            _result('JOVIE', client, jovie_cg, 'Temporary Mismatch', 'temp_mismatch', 0.7),
+        ]
+    return [
+        _result('BUCA', client, buca_cg, 'Caregiver Mismatch', 'diff_caregiver_mismatch', 0.7),
+        _result('JOVIE', client, jovie_cg, 'Caregiver Mismatch', 'diff_caregiver_mismatch', 0.7),
+    ]
+
+def _fuzzy_results(buca_rows, jovie_rows, buca_caregiver_map, caregiver_index, timer=NULL_TIMER):
+    """
+    Result rows for clients found on one side only (keyed rows as from _keyed_rows).
+    """
+    results = []
+    missing_in_jovie = {}
+    unmatched_jovie = set(jovie_rows)
+    jovie_index = FuzzyIndex(unmatched_jovie)
+    # Same order as compare_buca_jovie, so contested matches resolve identically
+    for done, client_lc in enumerate(sorted(buca_rows)):
+        timer.progress('fuzzy', done, len(buca_rows))
+        buca_client, buca_cg, buca_cg_lc = buca_rows[client_lc]
+        best = jovie_index.best_match(client_lc, cutoff=0.6)
+        if best is not None and (jovie_rows[best][2] == buca_cg_lc
+                                 or listed_caregiver(buca_cg, jovie_rows[best][2]) is not None):
+            jovie_client, jovie_cg, _ = jovie_rows[best]
+            results.append(_result('BUCA', buca_client, buca_cg, 'Temporary Mismatch', 'temp_mismatch', 0.7))
+            results.append(_result('JOVIE', jovie_client, jovie_cg, 'Temporary Mismatch', 'temp_mismatch', 0.7))
+            unmatched_jovie.remove(best)
+            jovie_index.remove(best)
+        else:
+            missing_in_jovie[client_lc] = len(results)
+            results.append(_result('Missing in JOVIE', buca_client, buca_cg, 'Complete Mismatch', 'complete_mismatch', 0.0))
+    # Sorted like compare_buca_jovie, so the same JOVIE row claims a contested BUCA client
+    for client_lc in sorted(unmatched_jovie):
+        jovie_client, jovie_cg, jovie_cg_lc = jovie_rows[client_lc]
+        orphan = _orphan_match(jovie_cg_lc, buca_caregiver_map, caregiver_index)
+        if orphan is not None:
+            _orphan_buca_row(orphan, missing_in_jovie, results)
+            results.append(_result('JOVIE', jovie_client, jovie_cg, 'Temporary Mismatch', 'temp_mismatch', 0.7))
+        else:
+            results.append(_result('Missing in BUCA', jovie_client, jovie_cg, 'Complete Mismatch', 'complete_mismatch', 0.0))
+    return results
+
+def compare_buca_jovie_merged(buca_df, jovie_df, corrections, timer=None):
+    """
+    Same results as compare_buca_jovie, but client keys are normalized once as columns
+    and BUCA/JOVIE are joined with a single merge instead of a mask scan per client.
+    """
+    timer = timer or NULL_TIMER
+    buca, jovie = _corrected_frames(buca_df, jovie_df, corrections)
+    timer.mark('corrections')
+    b = _client_keys(buca)
+    j = _client_keys(jovie)
+    timer.mark('maps')
+    results = []
+    # Exact client matches, classified in bulk
+    m = b.merge(j, on='client_lc', suffixes=('_b', '_j'))
+    same_cg = (m['caregiver_lc_b'] == m['caregiver_lc_j']).tolist()
+    multi_cg = m['caregiver_b'].str.contains(r'[,/&]', regex=True).tolist()
+    for client, buca_cg, jovie_cg, same, multi in zip(
+            m['client_b'].tolist(), m['caregiver_b'].tolist(), m['caregiver_j'].tolist(), same_cg, multi_cg):
+        results.extend(_exact_results(client, buca_cg, jovie_cg, same, multi))
+    timer.mark('exact')
+    # Fuzzy client matches on the remaining keys, looked up by index rather than scanned
+    matched = set(m['client_lc'])
+    results.extend(_fuzzy_results(
+        _keyed_rows(b[~b['client_lc'].isin(matched)]),
+        _keyed_rows(j[~j['client_lc'].isin(matched)]),
+        _caregiver_map(buca),
+        _caregiver_index(buca),
+        timer,
+    ))
+    # Orphan JOVIE rows are resolved inside _fuzzy_results here
+    timer.mark('fuzzy')
+    return results
+
+def _corrected_value(value, mapping):
+    # Like apply_corrections: only string values are looked up
+    if mapping and isinstance(value, str):
+        fixed = mapping.get(value.strip().lower())
+        if fixed is not None:
+            return fixed
+    return value
+
+def _record_keys(records):
+    """
+    _keyed_rows(_client_keys(...)) for RowRecords: client_lc -> (client, caregiver, caregiver_lc),
+    keys in order of first appearance.
+    """
+    first_cg = {}
+    spelling = {}
+    for r in records:
+        first_cg.setdefault(r.client, r.caregiver)
+        spelling[str(r.client).strip().lower()] = r.client
+    out = {}
+    for client_lc, client in spelling.items():
+        cg = str(first_cg[client])
+        out[client_lc] = (client, cg, cg.strip().lower())
+    return out
+
+def compare_buca_jovie_lite(buca, jovie, corrections, timer=None):
+    """
+    Same results as compare_buca_jovie in plain Python: buca/jovie are RowRecord lists
+    (from records_from_rows) or standardized DataFrames, and no pandas work is done.
+    """
+    timer = timer or NULL_TIMER
+    if not isinstance(buca, list):
+        buca = records_from_frame(buca)
+    if not isinstance(jovie, list):
+        jovie = records_from_frame(jovie)
+    corrections = compile_corrections(corrections)
+    client_fix = corrections.mapping_for('Client')
+    cg_fix = corrections.mapping_for('Caregiver')
+    buca = [RowRecord(_corrected_value(r.client, client_fix), _corrected_value(r.caregiver, cg_fix)) for r in buca]
+    jovie = [RowRecord(_corrected_value(r.client, client_fix), _corrected_value(r.caregiver, cg_fix)) for r in jovie]
+    timer.mark('corrections')
+    buca_rows = _record_keys(buca)
+    jovie_rows = _record_keys(jovie)
+    caregiver_map = {str(r.caregiver).strip().lower(): r.caregiver for r in buca}
+    caregiver_index = CaregiverIndex((str(r.client).strip().lower(), r.client, r.caregiver) for r in buca)
+    timer.mark('maps')
+    results = []
+    for client_lc in buca_rows.keys() & jovie_rows.keys():
+        client, buca_cg, buca_cg_lc = buca_rows[client_lc]
+        _, jovie_cg, jovie_cg_lc = jovie_rows[client_lc]
+        multi = ',' in buca_cg or '/' in buca_cg or '&' in buca_cg
+        results.extend(_exact_results(client, buca_cg, jovie_cg, buca_cg_lc == jovie_cg_lc, multi))
+    timer.mark('exact')
+    unmatched_buca = set(buca_rows) - set(jovie_rows)
+    unmatched_jovie = set(jovie_rows) - set(buca_rows)
+    results.extend(_fuzzy_results(
+        {k: buca_rows[k] for k in unmatched_buca},
+        {k: jovie_rows[k] for k in unmatched_jovie},
+        caregiver_map,
+        caregiver_index,
+        timer,
+    ))
+    timer.mark('fuzzy')
+    return results
+
+class CompareState:
+    """
+    Everything compare_incremental needs to reuse a previous comparison: the keyed
+    (corrected) rows of both sides and the result rows grouped by what produced them.
+    """
+
+    def __init__(self, buca_rows, jovie_rows, exact, fuzzy_inputs, fuzzy):
+        self.buca_rows = buca_rows
+        self.jovie_rows = jovie_rows
+        self.exact = exact
+        self.fuzzy_inputs = fuzzy_inputs
+        self.fuzzy = fuzzy
+
+    def results(self):
+        out = [r for group in self.exact.values() for r in group]
+        out.extend(self.fuzzy)
+        return out
+
+def compare_incremental(buca_df, jovie_df, corrections, previous=None):
+    """
+    Same results as compare_buca_jovie_merged, reusing a previous CompareState.
+    Clients whose corrected BUCA/JOVIE rows are unchanged keep their result rows, so
+    after a row edit or a new correction only the touched clients are reclassified.
+    The one-sided (fuzzy) phase is rerun only if its inputs changed.
+    Returns (state, stats).
+    """
+    buca, jovie = _corrected_frames(buca_df, jovie_df, corrections)
+    buca_rows = _keyed_rows(_client_keys(buca))
+    jovie_rows = _keyed_rows(_client_keys(jovie))
+    prev_exact = previous.exact if previous else {}
+    prev_buca = previous.buca_rows if previous else {}
+    prev_jovie = previous.jovie_rows if previous else {}
+    exact = {}
+    reclassified = 0
+    for client_lc, (client, buca_cg, buca_cg_lc) in buca_rows.items():
+        jovie_row = jovie_rows.get(client_lc)
+        if jovie_row is None:
+            continue
+        if (client_lc in prev_exact and prev_buca.get(client_lc) == buca_rows[client_lc]
+                and prev_jovie.get(client_lc) == jovie_row):
+            exact[client_lc] = prev_exact[client_lc]
+            continue
+        _, jovie_cg, jovie_cg_lc = jovie_row
+        multi = ',' in buca_cg or '/' in buca_cg or '&' in buca_cg
+        exact[client_lc] = _exact_results(client, buca_cg, jovie_cg, buca_cg_lc == jovie_cg_lc, multi)
+        reclassified += 1
+    unmatched_buca = {k: v for k, v in buca_rows.items() if k not in jovie_rows}
+    unmatched_jovie = {k: v for k, v in jovie_rows.items() if k not in buca_rows}
+    caregiver_map = _caregiver_map(buca)
+    caregiver_index = _caregiver_index(buca)
+    # Only the BUCA caregivers an unmatched JOVIE row could fall back to matter here
+    fuzzy_inputs = (
+        unmatched_buca,
+        unmatched_jovie,
+        {v[2]: _orphan_match(v[2], caregiver_map, caregiver_index) for v in unmatched_jovie.values()},
+    )
+    if previous is not None and previous.fuzzy_inputs == fuzzy_inputs:
+        fuzzy = previous.fuzzy
+        fuzzy_rerun = False
+    else:
+        fuzzy = _fuzzy_results(unmatched_buca, unmatched_jovie, caregiver_map, caregiver_index)
+        fuzzy_rerun = True
+    state = CompareState(buca_rows, jovie_rows, exact, fuzzy_inputs, fuzzy)
+    stats = {
+        'clients': len(exact) + len(unmatched_buca) + len(unmatched_jovie),
+        'reclassified': reclassified,
+        'reused': len(exact) - reclassified,
+        'fuzzyRerun': fuzzy_rerun,
+    }
+    return state, stats
+
+def _result_identity(r):
+    client = str(r.get('client') or '').strip().lower()
+    if client:
+        return (r.get('source'), client)
+    # Orphan rows have no client, tell them apart by caregiver
+    return (r.get('source'), '', str(r.get('caregiver') or '').strip().lower())
+
+def diff_results(old, new):
+    """
+    Delta between two result lists, matching rows on (source, client).
+    Returns {'added': [...], 'removed': [...], 'changed': [{'before', 'after'}]}.
+    """
+    def grouped(rows):
+        out = {}
+        for r in rows:
+            out.setdefault(_result_identity(r), []).append(r)
+        return out
+    before = grouped(old or [])
+    after = grouped(new)
+    delta = {'added': [], 'removed': [], 'changed': []}
+    for key in before.keys() | after.keys():
+        old_rows = before.get(key, [])
+        new_rows = after.get(key, [])
+        for o, n in zip(old_rows, new_rows):
+            if o != n:
+                delta['changed'].append({'before': o, 'after': n})
+        delta['removed'].extend(old_rows[len(new_rows):])
+        delta['added'].extend(new_rows[len(old_rows):])
+    return delta
+
+# Selectable from /compare via the 'engine' field so they can be A/B tested
+COMPARE_ENGINES = {
+    'loop': compare_buca_jovie,
+    'merge': compare_buca_jovie_merged,
+    'lite': compare_buca_jovie_lite,
+}
+# Same results as 'loop' without pandas; `python benchmark.py --check` compares them
+DEFAULT_COMPARE_ENGINE = 'lite'
+
+def engine_inputs(engine, buca_rows, jovie_rows):
+    """
+    /compare JSON rows in the form the engine takes: RowRecord lists for 'lite',
+    DataFrames otherwise. Raises ValueError like frames_from_rows.
+    """
+    if engine == 'lite':
+        return records_from_rows(buca_rows, jovie_rows)
+    return frames_from_rows(buca_rows, jovie_rows)
@@ -0,0 +1,248 @@
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+# Session tokens: what a client may send as X-Session-Id
+SESSION_ID_RE = re.compile(r'^[A-Za-z0-9_.:-]{1,64}$')
+DEFAULT_SESSION = 'default'
+# Seconds between idle-session sweeps, and between lastUsed writes for one session
+SWEEP_INTERVAL = 30
+TOUCH_INTERVAL = 10
+# Items measured per large container; the rest are assumed to be alike
+SIZE_SAMPLE = 64
+
+INDEX_KEY = 'workspaces'
+
+
+class InvalidSessionId(ValueError):
+    pass
+
+
+def check_session_id(value):
+    """
+    value as a session id, DEFAULT_SESSION if empty; InvalidSessionId if malformed.
+    """
+    if value is None or value == '':
+        return DEFAULT_SESSION
+    value = str(value)
+    if not SESSION_ID_RE.match(value):
+        raise InvalidSessionId('Session ids are 1-64 letters, digits or . _ : -')
+    return value
+
+
+def _value_key(session_id, name):
+    return f'workspace:{session_id}:{name}'
+
+
+def estimate_size(value, depth=4, _seen=None):
+    """
+    Approximate bytes held by value: DataFrames report their own deep usage, large
+    lists and dicts are measured on an evenly spaced sample of their items. Objects
+    shared between items (dict keys, repeated tags) are counted once.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    if hasattr(value, 'memory_usage') and hasattr(value, 'columns'):
+        return int(value.memory_usage(deep=True).sum())
+    size = sys.getsizeof(value)
+    if depth == 0 or isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        items = list(value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value)
+    elif hasattr(value, '__dict__'):
+        items = list(vars(value).values())
+    elif hasattr(value, '__slots__'):
+        items = [getattr(value, s, None) for s in value.__slots__]
+    else:
+        return size
+    if not items:
+        return size
+    step = max(1, len(items) // SIZE_SAMPLE)
+    sample = items[::step]
+    sampled = sum(estimate_size(item, depth - 1, _seen) for item in sample)
+    return size + sampled * len(items) // len(sample)
+
+
+class Workspaces:
+    """
+    Per-session working data (uploaded frames, parsed rows, compare results and
+    incremental compare state) kept in store, the app's shared state, under one
+    key per session and item. An index in the same store records each session's
+    item sizes and when it was last used:
+
+    - sessions idle for more than ttl seconds are dropped;
+    - when the total goes over max_bytes, the least recently used sessions other
+      than the one writing are dropped until it fits again.
+
+    Sizes are estimates (estimate_size). Index changes go through store.modify(),
+    so workers sharing an SQLite store apply them in turn rather than overwriting
+    each other's entries. The budget only covers what is kept here, not the app's
+    other caches.
+    """
+
+    def __init__(self, store, max_bytes, ttl):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._last_sweep = 0.0
+        # Items this process has read or written per session, so it can drop its
+        # copies once another worker evicted the session
+        self._seen = {}
+        self.evictions = {'ttl': 0, 'budget': 0}
+
+    def _index(self):
+        return dict(self.store.get(INDEX_KEY) or {})
+
+    def get(self, session_id, name):
+        self._maybe_sweep()
+        meta = self._index().get(session_id)
+        if meta is None or name not in meta['sizes']:
+            return None
+        now = time.time()
+        if now - meta['lastUsed'] > TOUCH_INTERVAL:
+            def touch(index):
+                index = dict(index or {})
+                if session_id in index:
+                    index[session_id] = dict(index[session_id], lastUsed=now)
+                return index
+            self.store.modify(INDEX_KEY, touch)
+        with self._lock:
+            self._seen.setdefault(session_id, set()).add(name)
+        value = self.store.get(_value_key(session_id, name))
+        if value is None:
+            # Evicted by another worker while this session wrote it again: unlist it
+            def unlist(index):
+                index = dict(index or {})
+                meta = index.get(session_id)
+                if meta is not None and name in meta['sizes']:
+                    sizes = {n: b for n, b in meta['sizes'].items() if n != name}
+                    index[session_id] = dict(meta, sizes=sizes)
+                return index
+            self.store.modify(INDEX_KEY, unlist)
+        return value
+
+    def put(self, session_id, name, value):
+        """
+        Stores value in the session's workspace (None removes it), then evicts
+        other sessions if the budget is exceeded.
+        """
+        self._maybe_sweep()
+        size = estimate_size(value) if value is not None else 0
+        key = _value_key(session_id, name)
+        if value is None:
+            self.store.pop(key, None)
+        else:
+            self.store[key] = value
+        evicted = []
+
+        def record(index):
+            index = dict(index or {})
+            now = time.time()
+            meta = index.get(session_id) or {'sizes': {}, 'createdAt': now, 'lastUsed': now}
+            sizes = dict(meta['sizes'])
+            if value is None:
+                sizes.pop(name, None)
+            else:
+                sizes[name] = size
+            index[session_id] = dict(meta, sizes=sizes, lastUsed=now)
+            evicted[:] = self._evict_over_budget(index, session_id)
+            return index
+
+        self.store.modify(INDEX_KEY, record)
+        with self._lock:
+            self._seen.setdefault(session_id, set()).add(name)
+            self.evictions['budget'] += len(evicted)
+        for sid, meta in evicted:
+            self._drop_values(sid, meta)
+
+    def drop(self, session_id):
+        dropped = []
+
+        def remove(index):
+            index = dict(index or {})
+            meta = index.pop(session_id, None)
+            if meta is not None:
+                dropped.append(meta)
+            return index
+
+        self.store.modify(INDEX_KEY, remove)
+        if not dropped:
+            return False
+        self._drop_values(session_id, dropped[0])
+        return True
+
+    def _evict_over_budget(self, index, keep):
+        # Runs inside store.modify(): removes the evicted sessions from index
+        total = sum(sum(m['sizes'].values()) for m in index.values())
+        evicted = []
+        for sid in sorted(index, key=lambda s: index[s]['lastUsed']):
+            if total <= self.max_bytes:
+                break
+            if sid == keep:
+                continue
+            meta = index.pop(sid)
+            total -= sum(meta['sizes'].values())
+            evicted.append((sid, meta))
+        if total > self.max_bytes:
+            print(f"Workspace '{keep}' alone exceeds the workspace budget ({total} > {self.max_bytes} bytes)")
+        return evicted
+
+    def _drop_values(self, session_id, meta):
+        for name in meta['sizes']:
+            self.store.pop(_value_key(session_id, name), None)
+        with self._lock:
+            self._seen.pop(session_id, None)
+
+    def _maybe_sweep(self):
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        index = self._index()
+        expired = []
+        if any(now - meta['lastUsed'] > self.ttl for meta in index.values()):
+            def expire(index):
+                index = dict(index or {})
+                expired[:] = [(sid, index.pop(sid)) for sid, meta in list(index.items())
+                              if now - meta['lastUsed'] > self.ttl]
+                return index
+            index = self.store.modify(INDEX_KEY, expire)
+        with self._lock:
+            self.evictions['ttl'] += len(expired)
+            # Evicted by another worker, which removed the values: drop our cached copies
+            gone = [(sid, self._seen.pop(sid)) for sid in list(self._seen) if sid not in index]
+        for sid, meta in expired:
+            self._drop_values(sid, meta)
+        for sid, names in gone:
+            for name in names:
+                self.store.forget(_value_key(sid, name))
+
+    def stats(self):
+        """
+        {'sessions': [{session, bytes, items, createdAt, idleSeconds}], 'totalBytes', ...},
+        most recently used first.
+        """
+        index = self._index()
+        now = time.time()
+        sessions = [{
+            'session': sid,
+            'bytes': sum(meta['sizes'].values()),
+            'items': dict(meta['sizes']),
+            'createdAt': datetime.fromtimestamp(meta['createdAt'], timezone.utc).isoformat(),
+            'idleSeconds': round(now - meta['lastUsed'], 1),
+        } for sid, meta in sorted(index.items(), key=lambda kv: -kv[1]['lastUsed'])]
+        return {
+            'sessions': sessions,
+            'totalBytes': sum(s['bytes'] for s in sessions),
+            'maxBytes': self.max_bytes,
+            'ttlSeconds': self.ttl,
+            'evictions': dict(self.evictions),
+        }